@@ -0,0 +1,79 @@
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from lmt_db import lire_detections, lire_frames, ouvrir_lmt
+from synthetique import creer_base
+
+COLONNES = ["FRAMENUMBER", "ANIMALID", "MASS_X", "MASS_Y", "FRONT_X", "FRONT_Y", "BACK_X", "BACK_Y"]
+CHUNK_PKL = 900
+
+
+def chrono(f, repet=3):
+    best = float("inf")
+    for _ in range(repet):
+        t = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def ancien_coord(db_path):
+    conn = sqlite3.connect(db_path)
+    q = f"""SELECT {', '.join('D.' + c for c in COLONNES)}, F.TIMESTAMP
+            FROM DETECTION D JOIN FRAME F ON D.FRAMENUMBER = F.FRAMENUMBER"""
+    pd.read_sql_query(q, conn)
+    conn.close()
+
+
+def nouveau_coord(db_path, sidecar_dir):
+    conn = ouvrir_lmt(db_path, sidecar_dir)
+    lire_detections(conn, COLONNES)
+    conn.close()
+
+
+def ancien_pkl(db_path, frames):
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-1000000")
+    for start in range(0, len(frames), CHUNK_PKL):
+        chunk = frames[start:start + CHUNK_PKL]
+        q = f"""SELECT D.FRAMENUMBER, D.ANIMALID, D.MASS_X, D.MASS_Y, F.TIMESTAMP
+                FROM DETECTION D JOIN FRAME F ON D.FRAMENUMBER = F.FRAMENUMBER
+                WHERE D.FRAMENUMBER IN ({','.join('?' * len(chunk))})"""
+        pd.read_sql_query(q, conn, params=chunk)
+    conn.close()
+
+
+def nouveau_pkl(db_path, frames, sidecar_dir):
+    conn = ouvrir_lmt(db_path, sidecar_dir)
+    lire_frames(conn, ["ANIMALID", "MASS_X", "MASS_Y"], frames)
+    conn.close()
+
+
+# -------------------------- MAIN ----------------------------
+if __name__ == "__main__":
+    n_frames = 300_000     # ~2h45 à 30 fps, 3 animaux
+    with tempfile.TemporaryDirectory() as tmp:
+        db = creer_base(os.path.join(tmp, "synthetique.sqlite"), n_frames=n_frames)
+        sidecar = os.path.join(tmp, "sidecar")
+        print(f"Base synthétique : {n_frames} frames, {os.path.getsize(db) / 1e6:.0f} Mo")
+
+        # frames .pkl : rafales autour de ~200 appuis
+        rng = np.random.default_rng(0)
+        appuis = rng.choice(n_frames - 300, 200, replace=False)
+        frames = sorted({int(f) for a in appuis for f in range(a, a + 150)})
+
+        nouveau_coord(db, sidecar)     # construit la copie indexée hors chrono
+        resultats = {
+            "dataframe coord (DETECTION ⨝ FRAME complet)": (
+                chrono(lambda: ancien_coord(db)), chrono(lambda: nouveau_coord(db, sidecar))),
+            f"dataframe event pkl ({len(frames)} frames)": (
+                chrono(lambda: ancien_pkl(db, frames)), chrono(lambda: nouveau_pkl(db, frames, sidecar))),
+        }
+        for nom, (avant, apres) in resultats.items():
+            print(f"{nom} : {avant:.2f} s → {apres:.2f} s (x{avant / apres:.1f})")
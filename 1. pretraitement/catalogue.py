@@ -0,0 +1,107 @@
+import glob
+import os
+import re
+import sqlite3
+from datetime import datetime
+
+import pandas as pd
+
+RFID_VIDE = "000000000000"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session TEXT PRIMARY KEY,       -- nom du DB_*.csv
+    cage TEXT,
+    date TEXT,
+    csv_path TEXT,                  -- niveaux raw / 1s / 10s dans les sous-dossiers voisins
+    db_path TEXT,
+    event_path TEXT,
+    n_animaux INTEGER,
+    n_bins INTEGER,
+    t_debut INTEGER,
+    t_fin INTEGER,
+    n_appuis INTEGER,
+    maj TEXT
+);
+CREATE TABLE IF NOT EXISTS animaux (
+    session TEXT,
+    rfid TEXT,
+    rank TEXT,
+    sexe TEXT,
+    n_appuis INTEGER,
+    couverture REAL,                -- fraction des bins où l'animal est détecté
+    PRIMARY KEY (session, rfid)
+);
+CREATE INDEX IF NOT EXISTS idx_animaux_rank ON animaux(rank);
+"""
+
+
+def connecter(catalogue_path):
+    conn = sqlite3.connect(catalogue_path, timeout=60)   # plusieurs workers écrivent
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _archetypes(arche_csv, cage):
+    """suffixe RFID -> (rank, sexe), en privilégiant les lignes de la même cage."""
+    if not arche_csv or not os.path.isfile(arche_csv):
+        return {}
+    df = pd.read_csv(arche_csv, dtype=str)
+    df["suffixe"] = df["ID_Animal"].str.replace(r"\D", "", regex=True).str[-3:]
+    df["meme_cage"] = df["ID_Cage"].str.lstrip("0") == str(cage).lstrip("0")
+    df = df.sort_values("meme_cage", ascending=False).drop_duplicates("suffixe")
+    return {s: (r, x) for s, r, x in zip(df["suffixe"], df["rank"], df["Sex"])}
+
+
+def enregistrer_session(catalogue_path, final, csv_path, arche_csv=None,
+                        db_path=None, event_path=None, cage=None, date=None):
+    """Met à jour le résumé d'une session à partir de son dataframe 200 ms (format DB_*.csv)."""
+    session = os.path.basename(csv_path)
+    m = re.match(r"DB_(\w+?)_(\d{8})\.csv$", session)
+    cage = cage or (m.group(1) if m else None)
+    date = date or (m.group(2) if m else None)
+
+    rfids = sorted({c.split('_')[-1] for c in final.columns if c.startswith("MASS_X_")})
+    ts = pd.to_numeric(final['TIMESTAMP'], errors='coerce')
+    press = final['LEVER_PRESS'].astype(str).str.zfill(12) if 'LEVER_PRESS' in final else pd.Series(dtype=str)
+    n_appuis = press[press != RFID_VIDE].value_counts()
+    arche = _archetypes(arche_csv, cage)
+
+    animaux = [
+        (session, r, *arche.get(r[-3:], (None, None)),
+         int(n_appuis.get(r, 0)), float(final[f"MASS_X_{r}"].notna().mean()) if len(final) else 0.0)
+        for r in rfids
+    ]
+
+    conn = connecter(catalogue_path)
+    try:
+        with conn:
+            conn.execute("DELETE FROM animaux WHERE session = ?", (session,))
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?,?,?,?,?,?,?,?,?,?,?,?)",
+                (session, cage, date, os.path.abspath(csv_path), db_path, event_path,
+                 len(rfids), len(final),
+                 int(ts.min()) if ts.notna().any() else None,
+                 int(ts.max()) if ts.notna().any() else None,
+                 int(n_appuis.sum()), datetime.now().isoformat(timespec="seconds")))
+            conn.executemany("INSERT INTO animaux VALUES (?,?,?,?,?,?)", animaux)
+    finally:
+        conn.close()
+
+
+def indexer_csv(catalogue_path, csv_paths, arche_csv=None):
+    """Ajoute au catalogue des DB_*.csv déjà produits (sessions prétraitées avant le catalogue)."""
+    for p in csv_paths:
+        final = pd.read_csv(p, dtype={'LEVER_PRESS': str})
+        enregistrer_session(catalogue_path, final, p, arche_csv)
+        print(f"📂 Catalogué : {os.path.basename(p)}")
+
+
+# -------------------------- MAIN ----------------------------
+if __name__ == "__main__":
+    out_dir = r"C:\Users\I9_1\Desktop\LMT\dataframeM2"
+    indexer_csv(
+        os.path.join(out_dir, "catalogue.sqlite"),
+        glob.glob(os.path.join(out_dir, "DB*.csv")),
+        arche_csv=r"C:\Users\I9_1\Desktop\LMT\mice_archetypes_all_data.csv",
+    )
@@ -0,0 +1,52 @@
+import numpy as np
+
+CINEMATIQUE = ['SPEED', 'ACCEL', 'TURN_RATE']
+
+
+def direction_circulaire(sum_cos, sum_sin):
+    """Moyenne circulaire d'angles à partir des sommes de cos / sin (pas de cassure à ±π)."""
+    return np.arctan2(sum_sin, sum_cos)
+
+
+def angle_wrap(a):
+    """Ramène un écart d'angle dans ]-π, π]."""
+    return np.angle(np.exp(1j * np.asarray(a, dtype=float)))
+
+
+def ajouter_cinematique(df, ecart_max_ms, temps='TIMESTAMP', animal='ANIMALID'):
+    """
+    Ajoute SPEED (px/s), ACCEL (px/s²) et TURN_RATE (rad/s) à un dataframe long
+    (une ligne par temps et par animal, temps en ms), en différences arrière.
+    Vectorisé sur tous les animaux : le dataframe est trié par animal puis par
+    temps et une différence n'est gardée que si les deux lignes sont du même
+    animal et séparées d'au plus ecart_max_ms (trou de détection sinon → NaN).
+    """
+    df = df.sort_values([animal, temps], kind='stable').reset_index(drop=True)
+    t = df[temps].to_numpy(dtype=float) / 1000
+    aid = df[animal].to_numpy()
+    x = df['MASS_X'].to_numpy(dtype=float)
+    y = df['MASS_Y'].to_numpy(dtype=float)
+    d = df['DIRECTION'].to_numpy(dtype=float)
+
+    dt = np.full(len(df), np.nan)
+    dt[1:] = np.diff(t)
+    contigu = np.zeros(len(df), dtype=bool)
+    contigu[1:] = (aid[1:] == aid[:-1]) & (dt[1:] > 0) & (dt[1:] <= ecart_max_ms / 1000)
+    dt[~contigu] = np.nan
+
+    speed = np.full(len(df), np.nan)
+    speed[1:] = np.hypot(np.diff(x), np.diff(y))
+    speed /= dt
+
+    accel = np.full(len(df), np.nan)
+    accel[1:] = np.diff(speed)
+    accel /= dt
+
+    turn = np.full(len(df), np.nan)
+    turn[1:] = angle_wrap(np.diff(d))
+    turn /= dt
+
+    df['SPEED'] = speed
+    df['ACCEL'] = accel
+    df['TURN_RATE'] = turn
+    return df
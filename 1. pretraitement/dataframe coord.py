@@ -1,10 +1,28 @@
 
 import pandas as pd
-import sqlite3
 import numpy as np
 import os
 import re
-from concurrent.futures import ProcessPoolExecutor
+
+from catalogue import enregistrer_session
+from cinematique import CINEMATIQUE, ajouter_cinematique, direction_circulaire
+from lmt_db import lire_detections, ouvrir_lmt
+from ordonnanceur import Ordonnanceur
+
+BIN_MS = 200
+METRICS = ['MASS_X', 'MASS_Y', 'FRONT_X', 'FRONT_Y', 'DIRECTION'] + CINEMATIQUE
+# colonnes sommées par bin : DIRECTION est moyennée via cos / sin (moyenne circulaire)
+SOMMES = ['MASS_X', 'MASS_Y', 'FRONT_X', 'FRONT_Y', 'DIR_COS', 'DIR_SIN']
+
+# écart max entre deux échantillons d'un animal pour calculer vitesse / accélération
+# (au-delà : trou de détection) — en bins pour les niveaux agrégés, en ms pour les frames
+ECART_MAX_BINS = 2
+ECART_MAX_RAW_MS = 100
+
+# niveaux de la pyramide exportés en plus du CSV 200 ms (sous-dossier -> taille de bin en ms)
+# "raw" = frames brutes ; chaque niveau agrégé est dérivé du niveau plus fin
+NIVEAUX = {"raw": None, "1s": 1000, "10s": 10_000}
+
 
 class MouseDataProcessor:
     def __init__(
@@ -14,20 +32,29 @@ class MouseDataProcessor:
         output_dir=r"C:\Users\I9_1\Desktop\LMT\dataframeM2",
         output_csv_path=None,
         date_str=None,
+        niveaux=NIVEAUX,
+        sidecar_dir=None,
+        catalogue_path=None,
+        arche_csv=None,
     ):
         self.db_path = db_path
         self.output_dir = output_dir
+        self.niveaux = niveaux
+        self.sidecar_dir = sidecar_dir  # copie locale indexée si la base n'a pas d'index
+        # catalogue des sessions (cage, date, animaux / rangs, appuis, couverture, fichiers)
+        self.catalogue_path = catalogue_path or os.path.join(output_dir, "catalogue.sqlite")
+        self.arche_csv = arche_csv or os.path.join(os.path.dirname(output_dir), "mice_archetypes_all_data.csv")
 
         if date_str is None:
             m = re.search(r"(\d{8})", db_path)
             date_str = m.group(1) if m else "unknown_date"
         self.date_str = date_str
 
+        m_num = re.search(r"females(\d{2})_", db_path, re.I)
+        self.num = m_num.group(1) if m_num else "unknown"
         if output_csv_path is None:
-            m_num = re.search(r"females(\d{2})_", db_path, re.I)
-            num = m_num.group(1) if m_num else "unknown"
             output_csv_path = os.path.join(
-                output_dir, f"DB_{num}_{date_str}.csv"
+                output_dir, f"DB_{self.num}_{date_str}.csv"
             )
         self.output_csv_path = output_csv_path
 
@@ -40,6 +67,8 @@ class MouseDataProcessor:
         self.agg_df = None
         self.final = None
         self.rfid_list = None
+        self.pyramide = {}      # niveau -> dataframe agrégé (format long)
+        self.finals = {}        # niveau -> dataframe exporté (format large)
 
     def detect_event_csv(self):
         m = re.search(r"females(\d{2})_", os.path.basename(self.db_path), re.I)
@@ -57,60 +86,80 @@ class MouseDataProcessor:
         return None
 
     def connect_db(self):
-        self.conn = sqlite3.connect(self.db_path)
+        self.conn = ouvrir_lmt(self.db_path, self.sidecar_dir)
 
     def load_data(self):
-        query = """
-        SELECT 
-            D.FRAMENUMBER,
-            D.ANIMALID,
-            D.MASS_X,
-            D.MASS_Y,
-            D.FRONT_X,
-            D.FRONT_Y,
-            D.BACK_X,
-            D.BACK_Y,
-            F.TIMESTAMP
-        FROM DETECTION D
-        JOIN FRAME F ON D.FRAMENUMBER = F.FRAMENUMBER
-        """
-        self.df = pd.read_sql_query(query, self.conn)
+        self.df = lire_detections(self.conn, [
+            'FRAMENUMBER', 'ANIMALID',
+            'MASS_X', 'MASS_Y',
+            'FRONT_X', 'FRONT_Y',
+            'BACK_X', 'BACK_Y',
+        ])
 
     def preprocess(self):
         self.df['TIMESTAMP'] = pd.to_datetime(self.df['TIMESTAMP'], unit='ms')
         ts_ns = self.df['TIMESTAMP'].astype(np.int64)
-        bin_ns = 200_000_000
+        bin_ns = BIN_MS * 1_000_000
         self.df['TIME_BIN'] = pd.to_datetime((ts_ns // bin_ns) * bin_ns)
         self.df['DX'] = self.df['FRONT_X'] - self.df['BACK_X']
         self.df['DY'] = self.df['FRONT_Y'] - self.df['BACK_Y']
         self.df['DIRECTION'] = np.arctan2(self.df['DY'], self.df['DX'])
+        self.df['DIR_COS'] = np.cos(self.df['DIRECTION'])
+        self.df['DIR_SIN'] = np.sin(self.df['DIRECTION'])
 
     def aggregate(self):
-        self.agg_df = self.df.groupby(['TIME_BIN', 'ANIMALID']).agg({
-            'MASS_X': 'mean',
-            'MASS_Y': 'mean',
-            'FRONT_X': 'mean',
-            'FRONT_Y': 'mean',
-            'DIRECTION': 'mean'
-        }).reset_index()
+        """
+        Agrège en une passe les frames en bins de 200 ms, puis dérive les niveaux
+        plus grossiers (1 s, 10 s) des sommes / effectifs du niveau plus fin,
+        sans relire les frames.
+        """
+        g = self.df.groupby(['TIME_BIN', 'ANIMALID'])
+        sums, counts = g[SOMMES].sum(), g[SOMMES].count()
+        self.pyramide = {BIN_MS: self._moyennes(sums, counts, BIN_MS)}
 
-        self.agg_df['FORMATTED_TIME'] = self.agg_df['TIME_BIN'].dt.strftime('%m/%d  %H:%M:%S:%f').str[:-3]
-        self.agg_df['TIMESTAMP'] = self.agg_df['TIME_BIN'].astype(np.int64) // 10**6
+        for nom, ms in sorted(self.niveaux.items(), key=lambda kv: kv[1] or 0):
+            if ms is None:
+                continue
+            keys = [sums.index.get_level_values('TIME_BIN').floor(f'{ms}ms'),
+                    sums.index.get_level_values('ANIMALID')]
+            sums, counts = sums.groupby(keys).sum(), counts.groupby(keys).sum()
+            self.pyramide[nom] = self._moyennes(sums, counts, ms)
 
-    def pivot_and_format(self):
-        position_cols = ['MASS_X', 'MASS_Y', 'FRONT_X', 'FRONT_Y', 'DIRECTION']
-        pivot = self.agg_df.pivot_table(index=['FORMATTED_TIME', 'TIMESTAMP'], columns='ANIMALID', values=position_cols)
+        self.agg_df = self.pyramide[BIN_MS]
+
+    @staticmethod
+    def _moyennes(sums, counts, bin_ms):
+        agg = (sums / counts).reset_index()
+        agg['DIRECTION'] = direction_circulaire(agg.pop('DIR_COS'), agg.pop('DIR_SIN'))
+        agg['FORMATTED_TIME'] = agg['TIME_BIN'].dt.strftime('%m/%d  %H:%M:%S:%f').str[:-3]
+        agg['TIMESTAMP'] = agg['TIME_BIN'].astype(np.int64) // 10**6
+        return ajouter_cinematique(agg, ECART_MAX_BINS * bin_ms)
+
+    @staticmethod
+    def _pivot(agg_df, index_cols):
+        pivot = agg_df.pivot_table(index=index_cols, columns='ANIMALID', values=METRICS)
         pivot.columns = [f'{metric}_{int(float(animalid))}' for metric, animalid in pivot.columns]
         pivot = pivot.reset_index()
 
-        ordered_cols = ['FORMATTED_TIME', 'TIMESTAMP']
+        ordered_cols = list(index_cols)
         animal_ids = sorted(set(int(col.split('_')[-1]) for col in pivot.columns if col not in ordered_cols))
         for aid in animal_ids:
-            for metric in ['MASS_X', 'MASS_Y', 'FRONT_X', 'FRONT_Y', 'DIRECTION']:
+            for metric in METRICS:
                 col = f'{metric}_{aid}'
                 if col in pivot.columns:
                     ordered_cols.append(col)
-        self.final = pivot[ordered_cols]
+        return pivot[ordered_cols]
+
+    def pivot_and_format(self):
+        self.final = self._pivot(self.agg_df, ['FORMATTED_TIME', 'TIMESTAMP'])
+        for nom, ms in self.niveaux.items():
+            if ms is None:
+                raw = self.df[['FRAMENUMBER', 'ANIMALID', 'MASS_X', 'MASS_Y', 'FRONT_X', 'FRONT_Y', 'DIRECTION']].copy()
+                raw['TIMESTAMP'] = self.df['TIMESTAMP'].astype(np.int64) // 10**6
+                raw = ajouter_cinematique(raw, ECART_MAX_RAW_MS)
+                self.finals[nom] = self._pivot(raw, ['FRAMENUMBER', 'TIMESTAMP'])
+            else:
+                self.finals[nom] = self._pivot(self.pyramide[nom], ['FORMATTED_TIME', 'TIMESTAMP'])
 
     def replace_animalid_with_rfid(self):
         animal_map = pd.read_sql_query("SELECT ID, RFID FROM ANIMAL", self.conn)
@@ -119,8 +168,14 @@ class MouseDataProcessor:
         id_to_rfid = dict(zip(animal_map['ID'], animal_map['RFID']))
         self.rfid_list = list(id_to_rfid.values())
 
+        self.final = self._renommer(self.final, id_to_rfid)
+        for nom in self.finals:
+            self.finals[nom] = self._renommer(self.finals[nom], id_to_rfid)
+
+    @staticmethod
+    def _renommer(df, id_to_rfid):
         new_columns = []
-        for col in self.final.columns:
+        for col in df.columns:
             if '_' in col and col not in ['FORMATTED_TIME', 'TIMESTAMP']:
                 base, aid = col.rsplit('_', 1)
                 try:
@@ -131,11 +186,28 @@ class MouseDataProcessor:
                 new_columns.append(f"{base}_{rfid}")
             else:
                 new_columns.append(col)
-        self.final.columns = new_columns
+        df.columns = new_columns
+        return df
+
+    @staticmethod
+    def _comptes_appuis(df, cle, cles_appuis, rfids_appuis, rfids):
+        """Colonnes LEVER_PRESS_<rfid> : nombre d'appuis de chaque animal dans chaque ligne de df."""
+        comptes = pd.crosstab(np.asarray(cles_appuis), np.asarray(rfids_appuis))
+        comptes = comptes.reindex(index=df[cle].to_numpy(), columns=rfids, fill_value=0)
+        for r in rfids:
+            df[f"LEVER_PRESS_{r}"] = comptes[r].to_numpy(dtype=np.int64)
 
     def merge_lever_press_with_rfid(self):
+        """
+        200 ms : LEVER_PRESS = RFID du presseur (format historique lu par les graphes).
+        Niveaux de la pyramide (raw, 1s, 10s) : LEVER_PRESS_<rfid> = nombre d'appuis
+        de l'animal dans la frame / le bin, plusieurs appuis pouvant tomber dans le même.
+        """
         if not self.event_csv_path:
             self.final["LEVER_PRESS"] = "000000000000"
+            for nom, ms in self.niveaux.items():
+                cle = 'FRAMENUMBER' if ms is None else 'FORMATTED_TIME'
+                self._comptes_appuis(self.finals[nom], cle, [], [], self.rfid_list)
             return
 
         events = pd.read_csv(
@@ -159,9 +231,38 @@ class MouseDataProcessor:
         lever_dict = dict(zip(lever_presses['FORMATTED_TIME'], lever_presses['rfid']))
         self.final['LEVER_PRESS'] = self.final['FORMATTED_TIME'].map(lever_dict).fillna("000000000000")
 
+        rfids = sorted(set(self.rfid_list) | set(lever_presses['rfid']))
+        for nom, ms in self.niveaux.items():
+            df = self.finals[nom]
+            if ms is None:
+                # frames brutes : l'appui est rattaché à la dernière frame qui le précède
+                ts = df['TIMESTAMP'].to_numpy(dtype=np.int64)
+                t_press = lever_presses['event_time'].astype('datetime64[ms]').astype(np.int64).to_numpy()
+                i = np.searchsorted(ts, t_press, side='right') - 1
+                ok = (i >= 0) & (t_press <= ts[-1]) if len(ts) else np.zeros(len(t_press), dtype=bool)
+                self._comptes_appuis(df, 'FRAMENUMBER', df['FRAMENUMBER'].to_numpy()[i[ok]],
+                                     lever_presses['rfid'].to_numpy()[ok], rfids)
+            else:
+                # niveaux grossiers : l'appui est rattaché au bin qui le contient
+                bins = lever_presses['event_time'].dt.floor(f'{ms}ms').dt.strftime('%m/%d  %H:%M:%S:%f').str[:-3]
+                self._comptes_appuis(df, 'FORMATTED_TIME', bins, lever_presses['rfid'], rfids)
+
     def export_csv(self):
         if self.output_csv_path:
             self.final.to_csv(self.output_csv_path, index=False)
+            # niveaux de la pyramide dans des sous-dossiers (hors du glob DB*.csv des graphes)
+            for nom, df in self.finals.items():
+                niveau_dir = os.path.join(os.path.dirname(self.output_csv_path), nom)
+                os.makedirs(niveau_dir, exist_ok=True)
+                df.to_csv(os.path.join(niveau_dir, os.path.basename(self.output_csv_path)), index=False)
+
+    def update_catalogue(self):
+        if self.output_csv_path and self.catalogue_path:
+            enregistrer_session(
+                self.catalogue_path, self.final, self.output_csv_path, self.arche_csv,
+                db_path=self.db_path, event_path=self.event_csv_path,
+                cage=self.num, date=self.date_str,
+            )
 
     def run(self):
         self.connect_db()
@@ -172,12 +273,12 @@ class MouseDataProcessor:
         self.replace_animalid_with_rfid()
         self.merge_lever_press_with_rfid()
         self.export_csv()
+        self.update_catalogue()
         return self.output_csv_path  # pour suivi éventuel
 
 def process_db(db_path):
     processor = MouseDataProcessor(db_path)
-    processor.run()
-    print(f"Terminé : {db_path}")
+    return processor.run()
 
 if __name__ == "__main__":
     db_paths = [
@@ -199,6 +300,7 @@ if __name__ == "__main__":
     ]
 
     max_workers = 24
+    budget_memoire = 48 * 1024**3   # RAM allouée au prétraitement
 
-    with ProcessPoolExecutor(max_workers=max_workers) as executor:
-        executor.map(process_db, db_paths)
+    ordonnanceur = Ordonnanceur(process_db, budget_memoire, max_workers=max_workers, retries=1)
+    ordonnanceur.executer(db_paths)
@@ -1,6 +1,9 @@
-import os, re, glob, pickle, sqlite3
+import os, re, glob, pickle
 import pandas as pd
 
+from lmt_db import lire_frames, ouvrir_lmt, sidecar_valide
+from staging import Staging
+
 # ---------------- METS TES DOSSIERS ICI ---------------- #
 db_dirs = [
     r"\\NAS-Kinect\home\Data Live Mouse Tracker\Clement\Data_LMT_3_mice\Expe1_Single_lever_food_EFAU003\Expe1_Single_lever_food_31032021",
@@ -23,9 +26,14 @@ db_dirs = [
 
 ]
 out_dir = r"C:\Users\I9_1\Desktop\LMT\dataframeM2"
+sidecar_dir = r"C:\Users\I9_1\Desktop\LMT\sidecar"   # copies locales indexées déjà faites (lues seulement)
+scratch_dir = r"C:\Users\I9_1\Desktop\LMT\scratch"   # copies locales temporaires
+quota_scratch = 50 * 1024**3
+marge_index = 1.25      # place réservée pour l'index FRAMENUMBER créé dans la copie
 ZONE = dict(x_min=215, x_max=310, y_min=320, y_max=385)
-chunk_size = 900
 
+# 1-3) repérage des fichiers sur le NAS
+sessions, infos = [], {}
 for db_dir in db_dirs:
     # 1) .sqlite
     db_files = glob.glob(os.path.join(db_dir, "*.sqlite"))
@@ -47,30 +55,31 @@ for db_dir in db_dirs:
         continue
     pkl_path = pkls[0]
 
+    cle = f"{animal_id}_{date_str}"
+    # copie indexée valide d'un précédent passage : la base n'est pas recopiée du NAS
+    sidecar = sidecar_valide(db_path, sidecar_dir)
+    sessions.append((cle, [pkl_path] if sidecar else [db_path, pkl_path]))
+    infos[cle] = (animal_id, date_str, db_path, pkl_path, sidecar)
+
+# les sessions suivantes sont copiées en local pendant le calcul de la courante
+staging = Staging(scratch_dir, quota_octets=quota_scratch, marge=marge_index)
+for cle, locaux in staging.iterer(sessions):
+    animal_id, date_str, db_nas, pkl_nas, sidecar = infos[cle]
+    db_path, pkl_path = sidecar or locaux[db_nas], locaux[pkl_nas]
+
     with open(pkl_path, "rb") as f:
         frames_pkl = pickle.load(f)
 
     # 4) SQL → pandas
-    conn = sqlite3.connect(db_path)
-    conn.execute("PRAGMA temp_store=MEMORY")
-    conn.execute("PRAGMA cache_size=-1000000")
+    # index manquants créés dans la copie de scratch : comptée dans le quota et évincée avec la session
+    conn = ouvrir_lmt(db_path, sur_place=not sidecar)
     df_anim = pd.read_sql_query("SELECT ID AS ANIMALID, RFID FROM ANIMAL", conn)
 
-    dfs = []
-    for start in range(0, len(frames_pkl), chunk_size):
-        chunk = frames_pkl[start:start + chunk_size]
-        q = f"""
-            SELECT D.FRAMENUMBER, D.ANIMALID,
-                   D.MASS_X, D.MASS_Y, F.TIMESTAMP
-            FROM DETECTION D
-            JOIN FRAME F ON D.FRAMENUMBER = F.FRAMENUMBER
-            WHERE D.FRAMENUMBER IN ({','.join('?'*len(chunk))})
-        """
-        dfs.append(pd.read_sql_query(q, conn, params=chunk))
+    # scans de plages ordonnées sur FRAMENUMBER (frames proches regroupées)
+    df = lire_frames(conn, ["ANIMALID", "MASS_X", "MASS_Y"], frames_pkl)
     conn.close()
 
-    df = (pd.concat(dfs, ignore_index=True)
-            .merge(df_anim, on="ANIMALID", how="left"))
+    df = df.merge(df_anim, on="ANIMALID", how="left")
     df["TIMESTAMP"] = pd.to_datetime(df["TIMESTAMP"], unit="ms")
 
     # 5) winner
@@ -0,0 +1,224 @@
+import os
+import shutil
+import sqlite3
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+MMAP_SIZE = 8 * 1024**3          # les bases LMT font quelques Go
+CACHE_SIZE = -1000000            # ~1 Go de cache de pages (KiB si négatif)
+
+# index nécessaires aux jointures / scans ordonnés : table -> colonne
+INDEX_REQUIS = {"DETECTION": "FRAMENUMBER", "FRAME": "FRAMENUMBER"}
+
+
+def uri_lecture_seule(db_path, immutable=True):
+    """
+    URI SQLite en lecture seule. immutable=1 supprime verrous et vérifications de
+    modification : à n'utiliser que sur une base qui n'est plus en cours d'écriture.
+    Gère les chemins Windows (C:\\...) et UNC (\\\\NAS-Kinect\\...).
+    """
+    p = os.path.abspath(db_path).replace("\\", "/")
+    if p.startswith("//"):
+        p = "//" + p            # UNC : autorité vide + //serveur/partage
+    elif not p.startswith("/"):
+        p = "/" + p             # C:/... -> /C:/...
+    uri = f"file:{quote(p)}?mode=ro"
+    if immutable:
+        uri += "&immutable=1"
+    return uri
+
+
+def _connecter(db_path, immutable=True, mmap_size=MMAP_SIZE):
+    conn = sqlite3.connect(uri_lecture_seule(db_path, immutable), uri=True)
+    conn.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute(f"PRAGMA cache_size={CACHE_SIZE}")
+    return conn
+
+
+def colonne_indexee(conn, table, colonne):
+    """True si colonne est la clé entière de la table ou la 1re colonne d'un index."""
+    for _, nom, type_, _, _, pk in conn.execute(f"PRAGMA table_info({table})"):
+        if nom.upper() == colonne and pk == 1 and type_.upper() == "INTEGER":
+            return True     # alias du ROWID
+    for index in conn.execute(f"PRAGMA index_list({table})"):
+        infos = conn.execute(f"PRAGMA index_info('{index[1]}')").fetchall()
+        if infos and infos[0][2] and infos[0][2].upper() == colonne:
+            return True
+    return False
+
+
+def index_manquants(conn):
+    return {t: c for t, c in INDEX_REQUIS.items() if not colonne_indexee(conn, t, c)}
+
+
+def _stamp(db_path):
+    src = os.stat(db_path)
+    return f"{src.st_size}_{int(src.st_mtime)}"
+
+
+def sidecar_valide(db_path, sidecar_dir):
+    """Copie indexée de db_path dans sidecar_dir si elle existe et que la source n'a pas changé, sinon None."""
+    if not sidecar_dir:
+        return None
+    copie = os.path.join(sidecar_dir, os.path.basename(db_path))
+    stamp_path = copie + ".stamp"
+    if os.path.isfile(copie) and os.path.isfile(stamp_path):
+        with open(stamp_path) as f:
+            if f.read() == _stamp(db_path):
+                return copie
+    return None
+
+
+def indexer(db_path, manquants):
+    """Crée sur place les index manquants (base modifiable : copie locale uniquement)."""
+    conn = sqlite3.connect(db_path)
+    try:
+        for table, colonne in manquants.items():
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{colonne} ON {table}({colonne})")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def copie_indexee(db_path, sidecar_dir, manquants):
+    """
+    Copie locale de la base avec les index manquants. Réutilisée tant que la
+    source n'a pas changé (taille et date de modification).
+    """
+    copie = sidecar_valide(db_path, sidecar_dir)
+    if copie:
+        return copie
+
+    os.makedirs(sidecar_dir, exist_ok=True)
+    copie = os.path.join(sidecar_dir, os.path.basename(db_path))
+    print(f"📂 Copie indexée de {os.path.basename(db_path)} → {sidecar_dir}")
+    shutil.copyfile(db_path, copie)
+    indexer(copie, manquants)
+    with open(copie + ".stamp", "w") as f:
+        f.write(_stamp(db_path))
+    return copie
+
+    print(f"📂 Copie indexée de {os.path.basename(db_path)} → {sidecar_dir}")
+    shutil.copyfile(db_path, copie)
+    conn = sqlite3.connect(copie)
+    try:
+        for table, colonne in manquants.items():
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{colonne} ON {table}({colonne})")
+        conn.commit()
+    finally:
+        conn.close()
+    with open(stamp_path, "w") as f:
+        f.write(stamp)
+    return copie
+
+
+def ouvrir_lmt(db_path, sidecar_dir=None, immutable=True, mmap_size=MMAP_SIZE, sur_place=False):
+    """
+    Ouvre une base LMT en lecture seule avec mmap et cache élargi.
+    Si DETECTION/FRAME ne sont pas indexées sur FRAMENUMBER : avertissement, ou
+    bascule sur une copie locale indexée si sidecar_dir est donné, ou, avec
+    sur_place (copie locale jetable, ex. staging), index créés dans db_path même.
+    """
+    conn = _connecter(db_path, immutable, mmap_size)
+    manquants = index_manquants(conn)
+    if not manquants:
+        return conn
+
+    if sur_place:
+        conn.close()
+        print(f"📂 Index {', '.join(f'{t}.{c}' for t, c in manquants.items())} créés dans {os.path.basename(db_path)}")
+        indexer(db_path, manquants)
+        return _connecter(db_path, immutable, mmap_size)
+
+    if sidecar_dir is None:
+        for table, colonne in manquants.items():
+            print(f"⚠️ Pas d'index sur {table}.{colonne} dans {os.path.basename(db_path)} : "
+                  f"les jointures / plages de frames seront lentes")
+        return conn
+
+    conn.close()
+    return _connecter(copie_indexee(db_path, sidecar_dir, manquants), immutable, mmap_size)
+
+
+# ---------------- lectures ---------------- #
+def _requete(colonnes, where="", ordre="D.FRAMENUMBER"):
+    cols = ", ".join(f"D.{c}" for c in colonnes)
+    return f"""
+        SELECT {cols}, F.TIMESTAMP
+        FROM DETECTION D
+        JOIN FRAME F ON D.FRAMENUMBER = F.FRAMENUMBER
+        {where}
+        ORDER BY {ordre}
+    """
+
+
+def lire_detections(conn, colonnes, debut=None, fin=None, chunksize=None):
+    """
+    DETECTION ⨝ FRAME parcourue dans l'ordre des FRAMENUMBER, éventuellement
+    restreinte à [debut, fin]. Avec chunksize, renvoie un itérateur de morceaux.
+    """
+    if debut is None and fin is None:
+        # le tracker écrit les détections frame après frame : l'ordre du ROWID est
+        # celui des FRAMENUMBER et évite de passer par l'index ligne à ligne
+        return pd.read_sql_query(_requete(colonnes, ordre="D.ROWID"), conn, chunksize=chunksize)
+    debut = -1 if debut is None else int(debut)
+    fin = np.iinfo(np.int64).max if fin is None else int(fin)
+    q = _requete(colonnes, "WHERE D.FRAMENUMBER BETWEEN ? AND ?")
+    return pd.read_sql_query(q, conn, params=(debut, fin), chunksize=chunksize)
+
+
+def plages(frames, ecart_max=300):
+    """Regroupe des numéros de frame triés en plages [debut, fin] séparées de plus de ecart_max."""
+    frames = np.unique(np.asarray(frames, dtype=np.int64))
+    if not len(frames):
+        return []
+    coupures = np.flatnonzero(np.diff(frames) > ecart_max) + 1
+    return [(int(b[0]), int(b[-1])) for b in np.split(frames, coupures)]
+
+
+def lire_frames(conn, colonnes, frames, ecart_max=300):
+    """
+    Détections d'une liste de frames : un scan de plage par groupe de frames
+    proches plutôt qu'une requête IN (...) par paquet.
+    """
+    frames = np.asarray(frames, dtype=np.int64)
+    colonnes = list(colonnes)
+    if "FRAMENUMBER" not in colonnes:
+        colonnes = ["FRAMENUMBER"] + colonnes
+    dfs = [lire_detections(conn, colonnes, debut, fin) for debut, fin in plages(frames, ecart_max)]
+    if not dfs:
+        return pd.DataFrame(columns=colonnes + ["TIMESTAMP"])
+    df = pd.concat(dfs, ignore_index=True)
+    return df[df["FRAMENUMBER"].isin(frames)].reset_index(drop=True)
+
+
+def lire_suite(conn, colonnes, apres_rowid, fin, chunksize=50_000):
+    """
+    Détections ajoutées après la ligne apres_rowid, jusqu'au frame fin inclus.
+    Recherche par ROWID (clé primaire de DETECTION) : pas de scan ni de tri de la
+    table, même sans index sur FRAMENUMBER. Le tracker écrit frame après frame, la
+    lecture s'arrête donc au premier frame > fin. Renvoie aussi la colonne ROWID.
+    """
+    colonnes = list(colonnes)
+    if "FRAMENUMBER" not in colonnes:
+        colonnes = ["FRAMENUMBER"] + colonnes
+    cols = ", ".join(f"D.{c}" for c in colonnes)
+    q = f"""
+        SELECT D.ROWID AS ROWID, {cols}, F.TIMESTAMP
+        FROM DETECTION D
+        JOIN FRAME F ON D.FRAMENUMBER = F.FRAMENUMBER
+        WHERE D.ROWID > ?
+        ORDER BY D.ROWID
+    """
+    dfs = []
+    for chunk in pd.read_sql_query(q, conn, params=(int(apres_rowid),), chunksize=chunksize):
+        garde = chunk["FRAMENUMBER"] <= fin
+        dfs.append(chunk[garde])
+        if not garde.all():
+            break
+    if not dfs:
+        return pd.DataFrame(columns=["ROWID"] + colonnes + ["TIMESTAMP"])
+    return pd.concat(dfs, ignore_index=True)
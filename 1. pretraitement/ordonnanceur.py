@@ -0,0 +1,171 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from lmt_db import ouvrir_lmt
+
+# mémoire crête approximative par ligne de DETECTION dans MouseDataProcessor
+# (dataframe chargé + colonnes calculées + groupby / pivot temporaires)
+OCTETS_PAR_LIGNE = 400
+
+
+def nb_detections(db_path):
+    """
+    Nombre de lignes de DETECTION. MAX(ROWID) est lu dans l'index de la table
+    (immédiat même sur le NAS) et vaut COUNT(*) tant qu'aucune ligne n'a été supprimée.
+    """
+    conn = ouvrir_lmt(db_path)
+    try:
+        n = conn.execute("SELECT MAX(ROWID) FROM DETECTION").fetchone()[0]
+    finally:
+        conn.close()
+    return n or 0
+
+
+def estimer_memoire(db_path, octets_par_ligne=OCTETS_PAR_LIGNE):
+    return nb_detections(db_path) * octets_par_ligne
+
+
+def _duree(s):
+    s = int(s)
+    return f"{s // 3600:d}h{s % 3600 // 60:02d}m{s % 60:02d}s"
+
+
+class Ordonnanceur:
+    """
+    Lance fonction(job) dans un pool de processus en respectant un budget mémoire :
+    • les jobs sont admis du plus gros au plus petit tant que la somme des
+      estimations en cours tient dans budget_memoire (un job plus gros que le
+      budget passe seul)
+    • progression et ETA affichées à chaque job terminé
+    • un job en échec est relancé jusqu'à retries fois, puis mis de côté ; si un
+      worker meurt (ex. MemoryError), le pool est recréé et les jobs qui tournaient
+      sont relancés un par un pour isoler le coupable
+    """
+
+    def __init__(self, fonction, budget_memoire, max_workers=os.cpu_count(),
+                 retries=1, estimateur=estimer_memoire):
+        self.fonction = fonction
+        self.budget_memoire = budget_memoire
+        self.max_workers = max_workers
+        self.retries = retries
+        self.estimateur = estimateur
+
+        self.resultats = {}
+        self.echecs = {}
+        self.suspects = set()
+
+    def _estimer(self, jobs):
+        estimations = {}
+        for job in jobs:
+            try:
+                estimations[job] = self.estimateur(job)
+            except Exception as e:
+                print(f"⚠️ Estimation impossible pour {job} : {e}")
+                self.echecs[job] = e
+        return estimations
+
+    def _admettre(self, attente, en_cours, estimations):
+        """Prochain job (le plus gros) qui tient dans le budget restant, sinon None."""
+        if len(en_cours) >= self.max_workers:
+            return None
+        if self.suspects & set(en_cours.values()):
+            return None
+        utilise = sum(estimations[j] for j in en_cours.values())
+        for job in attente:
+            if job in self.suspects:
+                if not en_cours:
+                    return job
+                continue
+            if not en_cours or utilise + estimations[job] <= self.budget_memoire:
+                return job
+        return None
+
+    def executer(self, jobs):
+        estimations = self._estimer(jobs)
+        attente = sorted(estimations, key=estimations.get, reverse=True)
+        total_mem = sum(estimations.values()) or 1
+        essais = {job: 0 for job in attente}
+        n_total = len(jobs)
+        fait_mem = 0
+        debut = time.monotonic()
+
+        en_cours = {}   # future -> job
+        executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        try:
+            while attente or en_cours:
+                job = self._admettre(attente, en_cours, estimations)
+                while job is not None:
+                    if estimations[job] > self.budget_memoire:
+                        print(f"⚠️ {job} dépasse le budget mémoire, lancé seul")
+                    try:
+                        fut = executor.submit(self.fonction, job)
+                    except BrokenProcessPool:
+                        break   # pool cassé entre-temps : traité après wait()
+                    attente.remove(job)
+                    essais[job] += 1
+                    en_cours[fut] = job
+                    job = self._admettre(attente, en_cours, estimations)
+
+                termines, _ = wait(en_cours, return_when=FIRST_COMPLETED)
+                casse = False
+                for fut in termines:
+                    job = en_cours.pop(fut)
+                    try:
+                        self.resultats[job] = fut.result()
+                    except BrokenProcessPool as e:
+                        casse = True
+                        if job in self.suspects:
+                            # il tournait seul : c'est lui qui a fait tomber le worker
+                            self._echec(job, e, essais, attente)
+                        else:
+                            self._suspecter(job, essais, attente)
+                        continue
+                    except Exception as e:
+                        self._echec(job, e, essais, attente)
+                        continue
+
+                    fait_mem += estimations[job]
+                    ecoule = time.monotonic() - debut
+                    # les jobs définitivement en échec ne restent plus à faire
+                    echec_mem = sum(estimations[j] for j in self.echecs if j in estimations)
+                    reste_mem = max(total_mem - fait_mem - echec_mem, 0)
+                    eta = ecoule / fait_mem * reste_mem if fait_mem else 0
+                    n_fait = len(self.resultats) + len(self.echecs)
+                    print(f"[{n_fait}/{n_total}] ✅ {os.path.basename(job)} — "
+                          f"écoulé {_duree(ecoule)}, reste ~{_duree(eta)}")
+
+                if casse:
+                    # un worker est mort : tous les jobs du pool sont perdus
+                    for job in en_cours.values():
+                        self._suspecter(job, essais, attente)
+                    en_cours.clear()
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                attente.sort(key=estimations.get, reverse=True)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        self.resume(time.monotonic() - debut)
+        return self.resultats
+
+    def _suspecter(self, job, essais, attente):
+        print(f"⚠️ {os.path.basename(job)} interrompu par la perte d'un worker, relancé seul")
+        essais[job] -= 1
+        self.suspects.add(job)
+        attente.append(job)
+
+    def _echec(self, job, erreur, essais, attente):
+        if essais[job] <= self.retries:
+            print(f"⚠️ {os.path.basename(job)} en échec ({erreur!r}), nouvel essai")
+            attente.append(job)
+        else:
+            print(f"❌ {os.path.basename(job)} en échec après {essais[job]} essai(s) : {erreur!r}")
+            self.echecs[job] = erreur
+
+    def resume(self, duree):
+        print("\n=== Résumé ===")
+        print(f"{len(self.resultats)} session(s) traitée(s), {len(self.echecs)} en échec, en {_duree(duree)}")
+        for job, erreur in self.echecs.items():
+            print(f"  ❌ {job} : {erreur!r}")
@@ -0,0 +1,106 @@
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+class Staging:
+    """
+    Copie en tâche de fond les fichiers des sessions à venir (NAS → disque local)
+    pendant que la session courante est calculée :
+    • au plus max_copies copies simultanées, au plus avance sessions d'avance
+    • la place réservée sur scratch_dir ne dépasse pas quota_octets (une session
+      plus grosse que le quota est copiée seule)
+    • les fichiers d'une session sont supprimés dès qu'elle a été traitée
+    • marge : facteur appliqué à la taille réservée, si les copies grossissent
+      sur place (ex. index créés dans la base copiée)
+    """
+
+    def __init__(self, scratch_dir, quota_octets=50 * 1024**3, max_copies=2, avance=4, marge=1.0):
+        self.scratch_dir = scratch_dir
+        self.quota_octets = quota_octets
+        self.marge = marge
+        self.max_copies = max_copies
+        self.avance = avance
+        self.reserve = 0
+        self._verrou = threading.Lock()
+
+    def taille(self, fichiers):
+        return int(sum(os.path.getsize(f) for f in fichiers) * self.marge)
+
+    def _copier(self, cle, fichiers):
+        dossier = os.path.join(self.scratch_dir, cle)
+        os.makedirs(dossier, exist_ok=True)
+        locaux = {}
+        for src in fichiers:
+            dst = os.path.join(dossier, os.path.basename(src))
+            tmp = dst + ".part"
+            shutil.copy2(src, tmp)      # copy2 garde la date : les copies indexées (lmt_db) restent valides
+            os.replace(tmp, dst)
+            locaux[src] = dst
+        return locaux
+
+    def _evincer(self, cle):
+        shutil.rmtree(os.path.join(self.scratch_dir, cle), ignore_errors=True)
+
+    def iterer(self, sessions):
+        """
+        sessions : liste ordonnée de (cle, [fichiers sources]).
+        Produit (cle, {source: copie locale}) dans le même ordre ; la copie d'une
+        session est évincée quand on passe à la suivante.
+        """
+        sessions = list(sessions)
+        tailles = {}
+        futures = {}    # indice -> (future, taille)
+        prochain = 0
+
+        def lancer(ex):
+            nonlocal prochain
+            while prochain < len(sessions) and len(futures) < self.avance:
+                cle, fichiers = sessions[prochain]
+                if prochain not in tailles:
+                    try:
+                        tailles[prochain] = self.taille(fichiers)
+                    except OSError as e:
+                        futures[prochain] = (ex.submit(_echec, e), 0)
+                        prochain += 1
+                        continue
+                t = tailles[prochain]
+                with self._verrou:
+                    if futures and self.reserve + t > self.quota_octets:
+                        return
+                    self.reserve += t
+                futures[prochain] = (ex.submit(self._copier, cle, fichiers), t)
+                prochain += 1
+
+        os.makedirs(self.scratch_dir, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=self.max_copies) as ex:
+            try:
+                for i, (cle, _) in enumerate(sessions):
+                    lancer(ex)
+                    fut, t = futures.pop(i)
+                    try:
+                        locaux = fut.result()
+                    except Exception as e:
+                        print(f"⚠️ Copie locale impossible pour {cle} : {e}")
+                        self._liberer(cle, t)
+                        continue
+                    try:
+                        yield cle, locaux
+                    finally:
+                        self._liberer(cle, t)
+            finally:
+                # arrêt anticipé : on ne laisse pas de copies orphelines
+                for j, (fut, t) in futures.items():
+                    fut.cancel()
+                    wait([fut])
+                    self._liberer(sessions[j][0], t)
+
+    def _liberer(self, cle, t):
+        self._evincer(cle)
+        with self._verrou:
+            self.reserve -= t
+
+
+def _echec(erreur):
+    raise erreur
@@ -0,0 +1,286 @@
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+
+from lmt_db import lire_suite, ouvrir_lmt
+
+BIN_MS = 200
+ZONES = {
+    "A": ((90, 60), (253, 162)),
+    "B": ((259, 60), (420, 162)),
+    "C": ((90, 260), (420, 360)),
+}
+ZLIST = "ABC"
+FEEDER = (265, 65)
+BINS_ORIENTATION = np.linspace(0, 2 * np.pi, 13)
+SOMMES = ['MASS_X', 'MASS_Y', 'FRONT_X', 'FRONT_Y', 'DIR_COS', 'DIR_SIN']
+RETENTION_MS = 60_000    # historique des zones gardé pour aligner les appuis (au-delà de l'appui en attente le plus ancien)
+MAX_FRAMES_POLL = 9000   # frames lues au plus par poll (5 min à 30 fps) quand le suivi démarre en retard
+
+
+def zones_vectorisees(x, y):
+    """Code de zone (0 = A, 1 = B, 2 = C) ou -1, pour des tableaux de positions."""
+    codes = np.full(np.shape(x), -1, dtype=np.int8)
+    for i, z in reversed(list(enumerate(ZLIST))):
+        (x1, y1), (x2, y2) = ZONES[z]
+        codes[(x1 <= x) & (x <= x2) & (y1 <= y) & (y <= y2)] = i
+    return codes
+
+
+class SuiviDirect:
+    """
+    Analyse incrémentale d'une base LMT en cours d'enregistrement.
+    À chaque poll(), seules les détections de FRAMENUMBER > dernier_frame sont lues :
+    • les bins de 200 ms terminés sont agrégés (et ajoutés à sortie_csv)
+    • occupation des zones et histogrammes d'orientation (vers la cible) par zone
+    • transitions A/C → B alignées sur les appuis (delay_before / delay_after),
+      et orientation des non presseurs à delay_orientation après l'appui
+    L'état est sauvegardé dans checkpoint_path : un redémarrage reprend où il s'était arrêté.
+    Une base déjà avancée est rattrapée par tranches de MAX_FRAMES_POLL frames.
+    """
+
+    def __init__(self, db_path, checkpoint_path, event_csv_path=None, sortie_csv=None,
+                 cible=FEEDER, delay_before=-5000, delay_after=3000, delay_orientation=1000):
+        self.db_path = db_path
+        self.checkpoint_path = checkpoint_path
+        self.event_csv_path = event_csv_path
+        self.sortie_csv = sortie_csv
+        self.cible = cible
+        self.delais = {"avant": delay_before, "apres": delay_after, "orientation": delay_orientation}
+        self.conn = None
+
+        if os.path.isfile(checkpoint_path):
+            with open(checkpoint_path, "rb") as f:
+                self.etat = pickle.load(f)
+            # checkpoints antérieurs au suivi par ROWID / à la taille de sortie
+            self.etat.setdefault("dernier_rowid", 0)
+            self.etat.setdefault("sortie_octets",
+                                 os.path.getsize(sortie_csv) if sortie_csv and os.path.isfile(sortie_csv) else 0)
+            print(f"📂 Reprise au frame {self.etat['dernier_frame']}")
+        else:
+            self.etat = {
+                "dernier_frame": 0,
+                "dernier_rowid": 0,               # dernière ligne de DETECTION lue
+                "sortie_octets": 0,               # taille de sortie_csv au dernier checkpoint
+                "dernier_bin": None,              # dernier bin de 200 ms fermé (ms)
+                "event_offset": 0,                # octets déjà lus dans le fichier event
+                "animaux": {},                    # ANIMALID -> RFID
+                "ouverts": None,                  # sommes / effectifs des bins non terminés
+                "historique": {},                 # (bin, rfid) -> (zone, angle)
+                "appuis": [],                     # (bin, rfid presseur) en attente
+                "occupation": {},                 # rfid -> comptes par zone
+                "orientation": np.zeros((len(ZLIST), len(BINS_ORIENTATION) - 1), dtype=np.int64),
+                "orientation_appui": np.zeros((len(ZLIST), len(BINS_ORIENTATION) - 1), dtype=np.int64),
+                "transitions": {},                # rfid non presseur -> [nb vers B, total]
+            }
+        self.en_retard = False
+
+        # bins écrits après le dernier checkpoint (arrêt entre les deux) : ils seront réémis
+        if self.sortie_csv and os.path.isfile(self.sortie_csv):
+            if os.path.getsize(self.sortie_csv) > self.etat["sortie_octets"]:
+                with open(self.sortie_csv, "r+b") as f:
+                    f.truncate(self.etat["sortie_octets"])
+
+    # ---------- lecture ---------- #
+    def _connecter(self):
+        if self.conn is None:
+            # pas immutable : la base est encore écrite par le tracker
+            self.conn = ouvrir_lmt(self.db_path, immutable=False)
+
+    def _nouvelles_detections(self):
+        self._connecter()
+        max_frame = self.conn.execute("SELECT MAX(FRAMENUMBER) FROM FRAME").fetchone()[0] or 0
+        # le dernier frame peut être encore incomplet : on le garde pour le poll suivant
+        fin = min(max_frame - 1, self.etat["dernier_frame"] + MAX_FRAMES_POLL)
+        self.en_retard = fin < max_frame - 1
+        if fin <= self.etat["dernier_frame"]:
+            return None
+        df = lire_suite(self.conn, ['FRAMENUMBER', 'ANIMALID', 'MASS_X', 'MASS_Y',
+                                    'FRONT_X', 'FRONT_Y', 'BACK_X', 'BACK_Y'],
+                        apres_rowid=self.etat["dernier_rowid"], fin=fin)
+        if len(df):
+            self.etat["dernier_rowid"] = int(df['ROWID'].max())
+        df = df[df['FRAMENUMBER'] > self.etat["dernier_frame"]]
+        self.etat["dernier_frame"] = fin
+
+        if not set(df['ANIMALID'].dropna().astype(int)) <= set(self.etat["animaux"]):
+            animaux = pd.read_sql_query("SELECT ID, RFID FROM ANIMAL", self.conn)
+            self.etat["animaux"] = {int(i): str(r) for i, r in zip(animaux['ID'], animaux['RFID'])}
+        return df
+
+    def _nouveaux_appuis(self):
+        if not self.event_csv_path or not os.path.isfile(self.event_csv_path):
+            return
+        with open(self.event_csv_path, "rb") as f:
+            f.seek(self.etat["event_offset"])
+            data = f.read()
+        # on ne lit que des lignes complètes
+        data = data[:data.rfind(b"\n") + 1]
+        self.etat["event_offset"] += len(data)
+        for ligne in data.decode("utf-8").splitlines():
+            champs = ligne.split(";")
+            if len(champs) < 4 or champs[0] != "id_lever" or not champs[3]:
+                continue
+            t = pd.to_datetime(champs[2], format='%d-%m-%Y %H:%M:%S:%f', errors='coerce')
+            if pd.isna(t):
+                continue
+            t_ms = t.value // 10**6
+            self.etat["appuis"].append((t_ms // BIN_MS * BIN_MS, champs[3].zfill(12)))
+
+    # ---------- agrégats ---------- #
+    def _agreger(self, df):
+        """Ajoute les détections aux bins ouverts ; renvoie les bins terminés (moyennes)."""
+        df = df.copy()
+        df['TIME_BIN'] = df['TIMESTAMP'] // BIN_MS * BIN_MS
+        direction = np.arctan2(df['FRONT_Y'] - df['BACK_Y'], df['FRONT_X'] - df['BACK_X'])
+        df['DIR_COS'], df['DIR_SIN'] = np.cos(direction), np.sin(direction)
+        g = df.groupby(['TIME_BIN', 'ANIMALID'])
+        nouveaux = pd.concat({"sum": g[SOMMES].sum(), "n": g[SOMMES].count()}, axis=1)
+
+        ouverts = self.etat["ouverts"]
+        ouverts = nouveaux if ouverts is None else ouverts.add(nouveaux, fill_value=0)
+
+        # le bin du dernier frame lu peut encore recevoir des frames
+        dernier = df['TIME_BIN'].max()
+        bins = ouverts.index.get_level_values('TIME_BIN')
+        fermes, self.etat["ouverts"] = ouverts[bins < dernier], ouverts[bins >= dernier]
+
+        agg = (fermes["sum"] / fermes["n"]).reset_index()
+        agg['DIRECTION'] = np.arctan2(agg.pop('DIR_SIN'), agg.pop('DIR_COS'))
+        agg['RFID'] = agg['ANIMALID'].astype(int).map(self.etat["animaux"])
+        if len(agg):
+            self.etat["dernier_bin"] = int(agg['TIME_BIN'].max())
+        return agg
+
+    def _mettre_a_jour(self, agg):
+        tx, ty = self.cible
+        mx, my = agg['MASS_X'].to_numpy(), agg['MASS_Y'].to_numpy()
+        fx, fy = agg['FRONT_X'].to_numpy(), agg['FRONT_Y'].to_numpy()
+        z = zones_vectorisees(mx, my)
+        with np.errstate(invalid='ignore'):
+            z[np.isnan(mx) | np.isnan(my) | (mx < 0) | (my < 0)] = -2   # position inconnue
+            ang = (np.arctan2(ty - my, tx - mx) - np.arctan2(fy - my, fx - mx)) % (2 * np.pi)
+        valide = (z >= 0) & ~np.isnan(ang)
+
+        occ = self.etat["occupation"]
+        for rfid, codes in pd.Series(z[z >= 0]).groupby(agg['RFID'].to_numpy()[z >= 0]):
+            occ.setdefault(rfid, np.zeros(len(ZLIST), dtype=np.int64))
+            occ[rfid] += np.bincount(codes, minlength=len(ZLIST))
+        for i in range(len(ZLIST)):
+            h, _ = np.histogram(ang[valide & (z == i)], BINS_ORIENTATION)
+            self.etat["orientation"][i] += h
+
+        hist = self.etat["historique"]
+        hist.update(zip(zip(agg['TIME_BIN'].astype(int), agg['RFID']), zip(z.tolist(), ang.tolist())))
+
+    def _elaguer(self):
+        """Oublie l'historique dont ni les appuis en attente ni la rétention n'ont besoin."""
+        if self.etat["dernier_bin"] is None:
+            return
+        limite = self.etat["dernier_bin"] - RETENTION_MS
+        if self.etat["appuis"]:
+            t_min = min(t for t, _ in self.etat["appuis"])
+            limite = min(limite, t_min + min(self.delais.values()))
+        hist = self.etat["historique"]
+        for cle in [c for c in hist if c[0] < limite]:
+            del hist[cle]
+
+    def _resoudre_appuis(self):
+        """Traite les appuis dont tous les bins décalés sont fermés."""
+        dernier = self.etat["dernier_bin"]
+        if dernier is None:
+            return
+        hist = self.etat["historique"]
+        rfids = sorted(set(self.etat["animaux"].values()))
+        attente = []
+        for t, r_press in self.etat["appuis"]:
+            if t + max(self.delais.values()) > dernier:
+                attente.append((t, r_press))
+                continue
+            for r in rfids:
+                if r == r_press:
+                    continue
+                avant = hist.get((t + self.delais["avant"], r))
+                apres = hist.get((t + self.delais["apres"], r))
+                if avant and apres and avant[0] in (0, 2) and apres[0] != -2:
+                    tr = self.etat["transitions"].setdefault(r, [0, 0])
+                    tr[0] += apres[0] == 1
+                    tr[1] += 1
+                orient = hist.get((t + self.delais["orientation"], r))
+                if orient and orient[0] >= 0 and not np.isnan(orient[1]):
+                    h, _ = np.histogram([orient[1]], BINS_ORIENTATION)
+                    self.etat["orientation_appui"][orient[0]] += h
+        self.etat["appuis"] = attente
+
+    # ---------- boucle ---------- #
+    def poll(self):
+        """Traite les nouvelles lignes ; renvoie le nombre de bins fermés."""
+        df = self._nouvelles_detections()
+        self._nouveaux_appuis()
+        n = 0
+        if df is not None and len(df):
+            agg = self._agreger(df)
+            n = len(agg)
+            self._mettre_a_jour(agg)
+            if self.sortie_csv and n:
+                agg.drop(columns='ANIMALID').to_csv(
+                    self.sortie_csv, mode='a', index=False,
+                    header=not self.etat["sortie_octets"])
+                self.etat["sortie_octets"] = os.path.getsize(self.sortie_csv)
+        # appuis résolus avant d'élaguer l'historique
+        self._resoudre_appuis()
+        self._elaguer()
+        self.sauver()
+        return n
+
+    def sauver(self):
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(self.etat, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    def resume(self):
+        occ = {r: dict(zip(ZLIST, c.tolist())) for r, c in self.etat["occupation"].items()}
+        return {
+            "dernier_frame": self.etat["dernier_frame"],
+            "occupation": occ,
+            "transitions": dict(self.etat["transitions"]),
+            "appuis_en_attente": len(self.etat["appuis"]),
+        }
+
+    def suivre(self, periode_s=1.0):
+        try:
+            while True:
+                debut = time.monotonic()
+                n = self.poll()
+                if n:
+                    print(f"⏱️ frame {self.etat['dernier_frame']} — {n} bins — {self.resume()['transitions']}")
+                if not self.en_retard:
+                    time.sleep(max(0.0, periode_s - (time.monotonic() - debut)))
+        except KeyboardInterrupt:
+            # pas de sauvegarde ici : l'état peut être à moitié mis à jour par le poll
+            # interrompu ; le checkpoint écrit à la fin du dernier poll complet fait foi
+            print("⏹️ Arrêt — reprise au dernier checkpoint")
+        finally:
+            if self.conn is not None:
+                self.conn.close()
+
+
+# -------------------------- MAIN ----------------------------
+if __name__ == "__main__":
+    db_path = r"C:\Users\I9_1\Desktop\LMT\en_cours\Expe1_Single_lever_food_females60_20250416.sqlite"
+    event_csv_path = r"C:\Users\I9_1\Desktop\LMT\en_cours\event_EFAU060_20250416.csv"
+    live_dir = r"C:\Users\I9_1\Desktop\LMT\direct"
+    os.makedirs(live_dir, exist_ok=True)
+
+    nom = os.path.splitext(os.path.basename(db_path))[0]
+    suivi = SuiviDirect(
+        db_path,
+        checkpoint_path=os.path.join(live_dir, f"{nom}.ckpt"),
+        event_csv_path=event_csv_path,
+        sortie_csv=os.path.join(live_dir, f"{nom}_200ms.csv"),
+    )
+    suivi.suivre(periode_s=1.0)
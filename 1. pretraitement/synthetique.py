@@ -0,0 +1,101 @@
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+# bases LMT synthétiques (mêmes tables / colonnes que le tracker) pour mesurer
+# les performances sans passer par le NAS
+T0_MS = 1617181920000
+FPS = 30
+RFIDS = ["000000000707", "000000000734", "000000000752"]
+
+
+def creer_schema(conn, index=False):
+    conn.execute("CREATE TABLE ANIMAL (ID INTEGER PRIMARY KEY, RFID TEXT, NAME TEXT)")
+    conn.execute("CREATE TABLE FRAME (FRAMENUMBER INTEGER PRIMARY KEY, TIMESTAMP INTEGER, NUMPARTICLE INTEGER)")
+    conn.execute("""
+        CREATE TABLE DETECTION (
+            ID INTEGER PRIMARY KEY AUTOINCREMENT, FRAMENUMBER INTEGER, ANIMALID INTEGER,
+            MASS_X REAL, MASS_Y REAL, MASS_Z REAL,
+            FRONT_X REAL, FRONT_Y REAL, FRONT_Z REAL,
+            BACK_X REAL, BACK_Y REAL, BACK_Z REAL)
+    """)
+    if index:
+        conn.execute("CREATE INDEX idx_DETECTION_FRAMENUMBER ON DETECTION(FRAMENUMBER)")
+
+
+def lignes_detection(frames, n_animaux=len(RFIDS), rng=None, taux_perte=0.05):
+    """Trajectoires aléatoires (marche + cap) ; ~taux_perte des détections manquent."""
+    rng = rng or np.random.default_rng(0)
+    n = len(frames)
+    blocs = []
+    for a in range(1, n_animaux + 1):
+        x = np.cumsum(rng.normal(0, 2, n)) % 400 + 50
+        y = np.cumsum(rng.normal(0, 2, n)) % 350 + 30
+        h = np.cumsum(rng.normal(0, 0.2, n))
+        garde = rng.random(n) > taux_perte
+        c, s = 8 * np.cos(h), 8 * np.sin(h)
+        zero = np.zeros(n)
+        bloc = np.column_stack([frames, np.full(n, a), x, y, zero, x + c, y + s, zero, x - c, y - s, zero])
+        blocs.append(bloc[garde])
+    lignes = np.vstack(blocs)
+    return lignes[np.lexsort((lignes[:, 1], lignes[:, 0]))]
+
+
+def inserer_frames(conn, debut, fin, n_animaux=len(RFIDS), rng=None):
+    """Ajoute les frames [debut, fin) et leurs détections (sert aussi d'écrivain simulé)."""
+    frames = np.arange(debut, fin)
+    ts = T0_MS + (frames * 1000 // FPS)
+    conn.executemany("INSERT INTO FRAME VALUES (?, ?, 0)", zip(frames.tolist(), ts.tolist()))
+    lignes = lignes_detection(frames, n_animaux, rng)
+    conn.executemany(
+        "INSERT INTO DETECTION (FRAMENUMBER, ANIMALID, MASS_X, MASS_Y, MASS_Z, FRONT_X, FRONT_Y, FRONT_Z,"
+        " BACK_X, BACK_Y, BACK_Z) VALUES (?,?,?,?,?,?,?,?,?,?,?)",
+        [(int(r[0]), int(r[1]), *r[2:].tolist()) for r in lignes],
+    )
+    conn.commit()
+
+
+def creer_base(db_path, n_frames=100_000, n_animaux=len(RFIDS), index=False, seed=0):
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(db_path)
+    try:
+        creer_schema(conn, index)
+        conn.executemany("INSERT INTO ANIMAL VALUES (?, ?, ?)",
+                         [(i + 1, RFIDS[i % len(RFIDS)], f"animal{i + 1}") for i in range(n_animaux)])
+        inserer_frames(conn, 1, n_frames + 1, n_animaux, rng)
+    finally:
+        conn.close()
+    return db_path
+
+
+def ecrivain(db_path, frames_par_lot=30, periode_s=1.0, n_lots=None,
+             event_csv_path=None, appui_tous_les=300, seed=0):
+    """
+    Simule le tracker sur une base existante : ajoute frames_par_lot frames toutes
+    les periode_s secondes (n_lots fois, ou sans fin) et, si event_csv_path est
+    donné, un appui levier toutes les appui_tous_les frames.
+    """
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(db_path)
+    try:
+        n_animaux = conn.execute("SELECT COUNT(*) FROM ANIMAL").fetchone()[0]
+        suivant = (conn.execute("SELECT MAX(FRAMENUMBER) FROM FRAME").fetchone()[0] or 0) + 1
+        lot = 0
+        while n_lots is None or lot < n_lots:
+            inserer_frames(conn, suivant, suivant + frames_par_lot, n_animaux, rng)
+            if event_csv_path:
+                appuis = [f for f in range(suivant, suivant + frames_par_lot) if f % appui_tous_les == 0]
+                with open(event_csv_path, "a") as f:
+                    for fn in appuis:
+                        t = np.datetime64(T0_MS + fn * 1000 // FPS, "ms").astype(object)
+                        rfid = RFIDS[int(rng.integers(n_animaux)) % len(RFIDS)]
+                        f.write(f"id_lever;lever;{t.strftime('%d-%m-%Y %H:%M:%S')}:{t.microsecond // 1000:03d};{rfid}\n")
+            suivant += frames_par_lot
+            lot += 1
+            time.sleep(periode_s)
+    finally:
+        conn.close()
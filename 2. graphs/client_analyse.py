@@ -0,0 +1,52 @@
+import json
+from urllib.error import URLError
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+
+class ClientAnalyse:
+    """
+    Client léger du serveur d'analyse (serveur_analyse.py).
+    Les scripts de graphes l'utilisent si le serveur tourne, sinon ils
+    recalculent en local comme avant.
+    """
+
+    def __init__(self, hote="127.0.0.1", port=8765, timeout=600):
+        self.base = f"http://{hote}:{port}"
+        self.timeout = timeout
+
+    def _get(self, route, **params):
+        url = f"{self.base}{route}?{urlencode(params)}"
+        with urlopen(url, timeout=self.timeout) as rep:
+            return json.loads(rep.read().decode("utf-8"))
+
+    def disponible(self):
+        try:
+            urlopen(f"{self.base}/etat", timeout=0.5).close()
+            return True
+        except (URLError, OSError):
+            return False
+
+    def occupation(self, rank, offset):
+        """{'A': n, 'B': n, 'C': n} des non presseurs de rank à t_press + offset (ms)."""
+        return self._get("/occupation", rank=rank, offset=offset)
+
+    def transitions(self, before, after):
+        """{1: [nb vers B, total], 3: [...]} des transitions A/C → B."""
+        res = self._get("/transitions", before=before, after=after)
+        return {int(k): v for k, v in res.items()}
+
+    def orientation(self, rank, delay, target="feeder"):
+        """Histogrammes d'angle par zone + bornes des secteurs ('bins')."""
+        return self._get("/orientation", rank=rank, delay=delay, target=target)
+
+    def rfids(self, rank):
+        """RFID du rank présents dans les sessions du serveur."""
+        return self._get("/rfids", rank=rank)["rfids"]
+
+    def aleatoire(self, rank, n=10_000, target="feeder", graine=42):
+        """
+        Baseline aléatoire (n lignes tirées dans les sessions du rank, tous animaux) :
+        'occupation' par zone, histogrammes d'angle par zone et 'bins'.
+        """
+        return self._get("/aleatoire", rank=rank, n=n, target=target, graine=graine)
@@ -0,0 +1,247 @@
+import glob
+import json
+import os
+import sys
+from multiprocessing import Pool, cpu_count
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from lmt_commun import ARENE, charger_ranks
+
+# accès aux bases LMT partagé avec le prétraitement
+sys.path.append(str(Path(__file__).resolve().parent.parent / "1. pretraitement"))
+from lmt_db import lire_detections, ouvrir_lmt
+
+
+# fenêtre péri-appui
+FENETRE_PERI = (-5000, 5000)   # ms autour de chaque appui
+CHUNK = 1_000_000
+
+
+class GrilleOccupation:
+    """
+    Grilles 2D d'occupation par animal et par fenêtre ("peri" / "baseline").
+    • ajouter() compte les positions par np.bincount sur l'indice de case
+    • sauver()/charger() : un .npz par session
+    • fusionner() additionne les grilles de plusieurs sessions
+    """
+
+    def __init__(self, resolution=5, arene=ARENE):
+        self.resolution = resolution
+        self.arene = arene
+        (x0, x1), (y0, y1) = arene
+        self.nx = int(np.ceil((x1 - x0) / resolution))
+        self.ny = int(np.ceil((y1 - y0) / resolution))
+        self.grilles = {}   # (rfid, fenetre) -> array (ny, nx)
+        self.ranks = {}     # rfid -> rank
+
+    def ajouter(self, x, y, rfid, fenetre):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        (x0, _), (y0, _) = self.arene
+        ix = np.floor((x - x0) / self.resolution)
+        iy = np.floor((y - y0) / self.resolution)
+        ok = (ix >= 0) & (ix < self.nx) & (iy >= 0) & (iy < self.ny)
+        flat = iy[ok].astype(np.int64) * self.nx + ix[ok].astype(np.int64)
+        counts = np.bincount(flat, minlength=self.nx * self.ny).reshape(self.ny, self.nx)
+
+        cle = (rfid, fenetre)
+        if cle in self.grilles:
+            self.grilles[cle] += counts
+        else:
+            self.grilles[cle] = counts
+
+    def total(self, rank=None, fenetre=None):
+        """Somme des grilles filtrées par rank et/ou fenêtre."""
+        out = np.zeros((self.ny, self.nx), dtype=np.int64)
+        for (rfid, f), g in self.grilles.items():
+            if rank is not None and self.ranks.get(rfid) != str(rank):
+                continue
+            if fenetre is not None and f != fenetre:
+                continue
+            out += g
+        return out
+
+    def fusionner(self, autre):
+        if (autre.resolution, autre.arene) != (self.resolution, self.arene):
+            raise ValueError("Grilles de résolution ou d'étendue différentes.")
+        for cle, g in autre.grilles.items():
+            if cle in self.grilles:
+                self.grilles[cle] += g
+            else:
+                self.grilles[cle] = g.copy()
+        self.ranks.update(autre.ranks)
+        return self
+
+    def sauver(self, path):
+        meta = {
+            "resolution": self.resolution,
+            "arene": self.arene,
+            "ranks": self.ranks,
+            "cles": [list(c) for c in self.grilles],
+        }
+        arrays = {f"g{i}": g for i, g in enumerate(self.grilles.values())}
+        np.savez_compressed(path, meta=json.dumps(meta), **arrays)
+
+    @classmethod
+    def charger(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            grille = cls(meta["resolution"], tuple(tuple(a) for a in meta["arene"]))
+            grille.ranks = meta["ranks"]
+            for i, (rfid, fenetre) in enumerate(meta["cles"]):
+                grille.grilles[(rfid, fenetre)] = data[f"g{i}"]
+        return grille
+
+
+def fenetres(ts, t_press, fenetre=FENETRE_PERI):
+    """Masque booléen : True si ts tombe dans [t_press + debut, t_press + fin] d'un appui."""
+    ts = np.asarray(ts, dtype=float)
+    t_press = np.sort(np.asarray(t_press, dtype=float))
+    if not len(t_press):
+        return np.zeros(ts.shape, dtype=bool)
+    debut, fin = fenetre
+    # appui le plus récent tel que t_press + debut <= ts
+    i = np.searchsorted(t_press + debut, ts, side='right') - 1
+    # les fenêtres ont toutes la même largeur : il suffit de tester le dernier appui ouvert
+    return (i >= 0) & (ts <= t_press[np.clip(i, 0, None)] + fin)
+
+
+# ---------------- sources ---------------- #
+def depuis_csv(path, grille, ranks, fenetre=FENETRE_PERI, chunksize=CHUNK):
+    """
+    Lit un DB_*.csv par morceaux, sans jamais le charger en entier.
+    Niveau "raw" (une ligne par frame, appuis en colonnes LEVER_PRESS_<rfid>) :
+    toutes les détections ; CSV 200 ms (colonne LEVER_PRESS) : une position moyenne par bin.
+    """
+    entete = pd.read_csv(path, nrows=0).columns
+    rfids = sorted({c.split('_')[-1] for c in entete if c.startswith("MASS_X_")})
+    for r in rfids:
+        grille.ranks[r] = ranks.get(r[-3:])
+
+    if 'LEVER_PRESS' in entete:
+        lp = pd.read_csv(path, usecols=['TIMESTAMP', 'LEVER_PRESS'], dtype={'LEVER_PRESS': str})
+        lp['TIMESTAMP'] = pd.to_numeric(lp['TIMESTAMP'], errors='coerce')
+        t_press = lp.loc[lp['LEVER_PRESS'].isin(rfids), 'TIMESTAMP'].dropna().to_numpy()
+    else:
+        cols_press = [c for c in entete if c.startswith("LEVER_PRESS_")]
+        lp = pd.read_csv(path, usecols=['TIMESTAMP'] + cols_press)
+        lp['TIMESTAMP'] = pd.to_numeric(lp['TIMESTAMP'], errors='coerce')
+        t_press = lp.loc[lp[cols_press].sum(axis=1) > 0, 'TIMESTAMP'].dropna().to_numpy()
+
+    cols = ['TIMESTAMP'] + [f"MASS_{a}_{r}" for r in rfids for a in "XY"]
+    for chunk in pd.read_csv(path, usecols=cols, chunksize=chunksize):
+        ts = pd.to_numeric(chunk['TIMESTAMP'], errors='coerce').to_numpy()
+        peri = fenetres(ts, t_press, fenetre)
+        for r in rfids:
+            x = chunk[f"MASS_X_{r}"].to_numpy(dtype=float)
+            y = chunk[f"MASS_Y_{r}"].to_numpy(dtype=float)
+            grille.ajouter(x[peri], y[peri], r, "peri")
+            grille.ajouter(x[~peri], y[~peri], r, "baseline")
+    return grille
+
+
+def presses_event_csv(event_csv_path):
+    """Instants (ms) des appuis d'un fichier event_*.csv."""
+    events = pd.read_csv(
+        event_csv_path,
+        sep=';',
+        header=None,
+        names=['event_type', 'event_target', 'event_time', 'rfid'],
+        dtype={'rfid': str}
+    )
+    events['event_time'] = pd.to_datetime(events['event_time'], format='%d-%m-%Y %H:%M:%S:%f', errors='coerce')
+    events = events.dropna(subset=['event_time'])
+    lever = events[(events['event_type'] == 'id_lever') & events['rfid'].notna()]
+    return lever['event_time'].astype('datetime64[ms]').astype(np.int64).to_numpy()
+
+
+def depuis_sqlite(db_path, grille, ranks, event_csv_path=None,
+                  fenetre=FENETRE_PERI, chunksize=CHUNK):
+    """
+    Parcourt DETECTION à pleine fréquence, par morceaux dans l'ordre du ROWID
+    (pas de tri : le fenêtrage péri-appui ne dépend pas de l'ordre des lignes).
+    """
+    t_press = presses_event_csv(event_csv_path) if event_csv_path else np.array([])
+
+    conn = ouvrir_lmt(db_path)
+    try:
+        animaux = pd.read_sql_query("SELECT ID, RFID FROM ANIMAL", conn)
+        id_to_rfid = {int(i): str(r) for i, r in zip(animaux['ID'], animaux['RFID'])}
+        for r in id_to_rfid.values():
+            grille.ranks[r] = ranks.get(r[-3:])
+
+        for chunk in lire_detections(conn, ['ANIMALID', 'MASS_X', 'MASS_Y'], chunksize=chunksize):
+            peri = fenetres(chunk['TIMESTAMP'].to_numpy(), t_press, fenetre)
+            aid = chunk['ANIMALID'].to_numpy()
+            x = chunk['MASS_X'].to_numpy(dtype=float)
+            y = chunk['MASS_Y'].to_numpy(dtype=float)
+            for a, r in id_to_rfid.items():
+                sel = aid == a
+                grille.ajouter(x[sel & peri], y[sel & peri], r, "peri")
+                grille.ajouter(x[sel & ~peri], y[sel & ~peri], r, "baseline")
+    finally:
+        conn.close()
+    return grille
+
+
+# ---------------- batch ---------------- #
+def traiter_session(path, arche_csv, out_dir, resolution=5, event_csv_path=None):
+    grille = GrilleOccupation(resolution)
+    ranks = charger_ranks(arche_csv)
+    if path.endswith(".sqlite"):
+        depuis_sqlite(path, grille, ranks, event_csv_path)
+    else:
+        depuis_csv(path, grille, ranks)
+    out = os.path.join(out_dir, f"heatmap_{Path(path).stem}.npz")
+    grille.sauver(out)
+    return out
+
+
+def fusionner_sessions(npz_paths):
+    grilles = [GrilleOccupation.charger(p) for p in npz_paths]
+    total = grilles[0]
+    for g in grilles[1:]:
+        total.fusionner(g)
+    return total
+
+
+def plot_heatmaps(grille, ranks=("1", "2", "3"), out_dir=None):
+    fig, axs = plt.subplots(len(ranks), 2, figsize=(10, 4 * len(ranks)), squeeze=False)
+    (x0, x1), (y0, y1) = grille.arene
+    for row, rank in zip(axs, ranks):
+        for ax, fenetre in zip(row, ("peri", "baseline")):
+            g = grille.total(rank=rank, fenetre=fenetre).astype(float)
+            if g.sum():
+                g /= g.sum()
+            ax.imshow(g, origin='upper', extent=(x0, x1, y1, y0), cmap='inferno')
+            ax.set_title(f"Rank {rank} – {fenetre}")
+            ax.set_xlabel('MASS_X')
+            ax.set_ylabel('MASS_Y')
+    plt.tight_layout()
+    if out_dir:
+        fname = os.path.join(out_dir, "heatmap_occupation")
+        fig.savefig(fname + ".png", dpi=300)
+        fig.savefig(fname + ".eps", format="eps")
+    plt.show()
+
+
+# -------------------------- MAIN ----------------------------
+if __name__ == "__main__":
+    save_dir = r"C:\Users\I9_1\Desktop\LMT"
+    grid_dir = os.path.join(save_dir, "heatmaps")
+    arche_csv = os.path.join(save_dir, "mice_archetypes_all_data.csv")
+    os.makedirs(grid_dir, exist_ok=True)
+
+    # niveau "raw" de dataframe coord : une ligne par frame, toutes les détections
+    sessions = glob.glob(os.path.join(save_dir, "dataframeM2", "raw", "DB*.csv"))
+    if not sessions:
+        raise FileNotFoundError("Aucun DB_*.csv trouvé dans dataframeM2\\raw (relancer dataframe coord)")
+
+    with Pool(processes=cpu_count()) as pool:
+        npz = pool.starmap(traiter_session, [(p, arche_csv, grid_dir) for p in sessions])
+
+    plot_heatmaps(fusionner_sessions(npz), out_dir=save_dir)
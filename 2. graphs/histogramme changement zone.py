@@ -1,10 +1,12 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-import glob
 from multiprocessing import Pool, cpu_count
 import os
 
+from client_analyse import ClientAnalyse
+from lmt_commun import selectionner_sessions
+
 
 ZONES = {
     "A": ((90, 60), (253, 162)),
@@ -121,17 +123,24 @@ def plot(transitions):
 if __name__ == "__main__":
     delay_before = -5000
     delay_after = 3000
-    csv_paths = glob.glob(r"C:\Users\I9_1\Desktop\LMT\dataframeM2\DB*.csv")
-    if not csv_paths:
-        raise FileNotFoundError("Aucun CSV trouvé")
-
-    args = [(p, delay_before, delay_after) for p in csv_paths]
-
     transitions = {1: [], 3: []}
-    with Pool(processes=cpu_count()) as pool:
-        results = pool.starmap(process_file, args)
-        for t1, t3 in results:
-            transitions[1].extend(t1)
-            transitions[3].extend(t3)
+    client = ClientAnalyse()
+    if client.disponible():
+        # sessions déjà en mémoire côté serveur
+        for rank, (n_b, n_tot) in client.transitions(delay_before, delay_after).items():
+            transitions[rank] = [True] * n_b + [False] * (n_tot - n_b)
+    else:
+        # process_file suppose 3 animaux (presseur + rank 1 + rank 3)
+        csv_paths = selectionner_sessions(r"C:\Users\I9_1\Desktop\LMT\dataframeM2", n_animaux=3)
+        if not csv_paths:
+            raise FileNotFoundError("Aucun CSV trouvé")
+
+        args = [(p, delay_before, delay_after) for p in csv_paths]
+
+        with Pool(processes=cpu_count()) as pool:
+            results = pool.starmap(process_file, args)
+            for t1, t3 in results:
+                transitions[1].extend(t1)
+                transitions[3].extend(t3)
 
     plot(transitions)
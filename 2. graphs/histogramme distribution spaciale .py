@@ -1,10 +1,12 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-import glob
 from pathlib import Path
 from scipy.stats import chi2_contingency
 
+from client_analyse import ClientAnalyse
+from lmt_commun import selectionner_sessions
+
 
 class PolarHistogramByRank:
     """
@@ -18,7 +20,7 @@ class PolarHistogramByRank:
 
     def __init__(self, db_csv_paths, arche_csv, target_coords,
                  rank_value="1", post_delay_ms=5000, pre_delay_ms=5000,
-                 random_n=10_000):
+                 random_n=10_000, client=None):
 
         self.db_csv_paths = db_csv_paths
         self.arche_csv = Path(arche_csv)
@@ -39,8 +41,13 @@ class PolarHistogramByRank:
         # suffixes du rank choisi
         self.rank_suffixes = self._load_rank_suffixes()
 
-        # dataframe concaténée + RFID filtrés
-        self.df, self.rfids = self._load_and_filter()
+        # dataframe concaténée + RFID filtrés (inutile si serveur_analyse tourne)
+        if client is not None:
+            self.df, self.rfids = None, client.rfids(self.rank_value)
+            if not self.rfids:
+                raise ValueError(f"Aucun RFID rank {self.rank_value} trouvé.")
+        else:
+            self.df, self.rfids = self._load_and_filter()
 
         # print RFIDs retenus
         print(f"\n=== RFID rank {self.rank_value} représentés ===")
@@ -105,6 +112,12 @@ class PolarHistogramByRank:
         self._collect_positions(-self.pre_delay_ms, self.pre_pos)
         self._collect_positions(self.post_delay_ms, self.post_pos)
 
+    def compute_positions_serveur(self, client):
+        """Comme compute_positions, à partir des occupations calculées par serveur_analyse."""
+        for offset, pos_list in ((-self.pre_delay_ms, self.pre_pos), (self.post_delay_ms, self.post_pos)):
+            for z, n in client.occupation(self.rank_value, offset).items():
+                pos_list.extend([z] * n)
+
     # ---------- baseline aléatoire ----------
     def compute_random(self):
         rows = self.df.sample(n=self.random_n, random_state=42)
@@ -117,6 +130,11 @@ class PolarHistogramByRank:
                 if z:
                     self.rand_pos.append(z)
 
+    def compute_random_serveur(self, client):
+        """Comme compute_random, à partir de la baseline tirée par serveur_analyse."""
+        for z, n in client.aleatoire(self.rank_value, self.random_n)["occupation"].items():
+            self.rand_pos.extend([z] * n)
+
     # ---------- histogramme ----------
     def plot_histogram(self, title):
         zones = list(self.zlist)
@@ -195,17 +213,25 @@ if __name__ == "__main__":
     if rank_in not in {"1", "2", "3", "male"}:
         raise ValueError("Rank doit être 1, 2, 3 ou 'male'.")
 
-    csv_files = glob.glob(r"C:\\Users\\I9_1\\Desktop\\LMT\\dataframeM2\\DB*.csv")
+    # sessions contenant un animal du rank choisi (catalogue), sinon tous les DB_*.csv
+    csv_files = selectionner_sessions(r"C:\\Users\\I9_1\\Desktop\\LMT\\dataframeM2", rank_value=rank_in)
     if not csv_files:
         raise FileNotFoundError("Aucun DB_*.csv trouvé")
 
+    client = ClientAnalyse()
+    client = client if client.disponible() else None
+
     plotter = PolarHistogramByRank(
         db_csv_paths=csv_files,
         arche_csv=r"C:\\Users\\I9_1\\Desktop\\LMT\\mice_archetypes_all_data.csv",
         target_coords=target,
-        rank_value=rank_in
+        rank_value=rank_in,
+        client=client
     )
-
-    plotter.compute_positions()
-    plotter.compute_random()
+    if client:
+        plotter.compute_positions_serveur(client)
+        plotter.compute_random_serveur(client)
+    else:
+        plotter.compute_positions()
+        plotter.compute_random()
     plotter.plot_histogram(f"{title} – rank {rank_in}")
\ No newline at end of file
@@ -1,14 +1,16 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-import glob
 from pathlib import Path
 
+from client_analyse import ClientAnalyse
+from lmt_commun import selectionner_sessions
+
 
 # -------------------------  CLASS  --------------------------
 class PolarHistogramByRank:
     def __init__(self, db_csv_paths, arche_csv, target_coords,
-                 rank_value="1", delay_ms=1000, random_n=10_000):
+                 rank_value="1", delay_ms=1000, random_n=10_000, client=None):
 
         self.db_csv_paths = db_csv_paths
         self.arche_csv = Path(arche_csv)
@@ -25,7 +27,13 @@ class PolarHistogramByRank:
         self.zlist = "ABC"
 
         self.rank_suffixes = self._load_rank_suffixes()
-        self.df, self.rfids = self._load_and_filter()
+        if client is not None:
+            # serveur_analyse a déjà les sessions en mémoire : pas de relecture des CSV
+            self.df, self.rfids = None, client.rfids(self.rank_value)
+            if not self.rfids:
+                raise ValueError(f"Aucun RFID rank {self.rank_value} trouvé.")
+        else:
+            self.df, self.rfids = self._load_and_filter()
 
         print(f"\n=== RFID rank {self.rank_value} représentés ===")
         for r in self.rfids:
@@ -87,6 +95,16 @@ class PolarHistogramByRank:
                 self.ang[z].append(ang)
                 self.post_pos.append(z)
 
+    def compute_angles_serveur(self, client, target_name):
+        """Comme compute_angles, à partir des histogrammes calculés par serveur_analyse."""
+        res = client.orientation(self.rank_value, self.delay_ms, target_name)
+        bins = np.asarray(res["bins"])
+        centers = (bins[:-1] + bins[1:]) / 2
+        for z in self.zlist:
+            # un angle au centre de chaque secteur, répété autant de fois que son effectif
+            self.ang[z].extend(np.repeat(centers, res[z]).tolist())
+            self.post_pos.extend([z] * int(sum(res[z])))
+
     def compute_random(self):
         tx, ty = self.target
         rows = self.df.sample(n=self.random_n, random_state=42)
@@ -107,6 +125,15 @@ class PolarHistogramByRank:
                 self.rand[z].append(ang)
                 self.rand_pos.append(z)
 
+    def compute_random_serveur(self, client, target_name):
+        """Comme compute_random, à partir de la baseline tirée par serveur_analyse."""
+        res = client.aleatoire(self.rank_value, self.random_n, target_name)
+        bins = np.asarray(res["bins"])
+        centers = (bins[:-1] + bins[1:]) / 2
+        for z in self.zlist:
+            self.rand[z].extend(np.repeat(centers, res[z]).tolist())
+            self.rand_pos.extend([z] * int(sum(res[z])))
+
     def plot_polar(self, title):
         bins = np.linspace(0, 2 * np.pi, 13)
         centers = (bins[:-1] + bins[1:]) / 2
@@ -179,6 +206,7 @@ if __name__ == "__main__":
     LEVER, FEEDER = (250, 350), (265, 65)
 
     choice = input("Cible (levier/feeder) : ").strip().lower()
+    target_name = "levier" if choice == "levier" else "feeder"
     target = LEVER if choice == "levier" else FEEDER
     title = "Direction levier" if choice == "levier" else "Direction feeder"
 
@@ -186,17 +214,26 @@ if __name__ == "__main__":
     if rank_in not in {"1", "2", "3"}:
         raise ValueError("Rank doit être 1, 2 ou 3.")
 
-    csv_files = glob.glob(r"C:\Users\I9_1\Desktop\LMT\dataframeM2\DB*.csv")
+    # sessions contenant un animal du rank choisi (catalogue), sinon tous les DB_*.csv
+    csv_files = selectionner_sessions(r"C:\Users\I9_1\Desktop\LMT\dataframeM2", rank_value=rank_in)
     if not csv_files:
         raise FileNotFoundError("Aucun DB_*.csv trouvé")
 
+    client = ClientAnalyse()
+    client = client if client.disponible() else None
+
     plotter = PolarHistogramByRank(
         db_csv_paths=csv_files,
         arche_csv=r"C:\Users\I9_1\Desktop\LMT\mice_archetypes_all_data.csv",
         target_coords=target,
-        rank_value=rank_in
+        rank_value=rank_in,
+        client=client
     )
-    plotter.compute_angles()
-    plotter.compute_random()
+    if client:
+        plotter.compute_angles_serveur(client, target_name)
+        plotter.compute_random_serveur(client, target_name)
+    else:
+        plotter.compute_angles()
+        plotter.compute_random()
     plotter.plot_polar(f"{title} – Storer")
     plotter.plot_histogram(f"{title} – rank {rank_in}")
@@ -0,0 +1,123 @@
+import glob
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+
+# zones (x1,y1) coin HG ; (x2,y2) coin BD
+ZONES = {
+    "A": ((90, 60), (253, 162)),
+    "B": ((259, 60), (420, 162)),
+    "C": ((90, 260), (420, 360)),  # ancienne C+D
+}
+ZLIST = "ABC"
+
+# étendue de l'arène LMT (pixels)
+ARENE = ((0, 512), (0, 424))
+
+RFID_VIDE = "000000000000"
+
+
+def zones_vectorisees(x, y):
+    """
+    Version vectorisée de zone_of : renvoie pour chaque point le code de zone
+    (0 = A, 1 = B, 2 = C) ou -1 hors zone / coordonnée manquante.
+    Les zones sont testées dans l'ordre, la première qui contient le point gagne.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    codes = np.full(x.shape, -1, dtype=np.int8)
+    for i, z in reversed(list(enumerate(ZLIST))):
+        (x1, y1), (x2, y2) = ZONES[z]
+        dedans = (x1 <= x) & (x <= x2) & (y1 <= y) & (y <= y2)
+        codes[dedans] = i
+    return codes
+
+
+def charger_suffixes_rank(arche_csv, rank_value):
+    """Suffixes (3 derniers chiffres) des RFID du rank choisi ("1", "2", "3" ou "male")."""
+    df = pd.read_csv(Path(arche_csv), dtype=str)
+    if str(rank_value) == "male":
+        filt = df["rank"].isin({"1", "3"})
+    else:
+        filt = df["rank"] == str(rank_value)
+    return set(
+        df[filt]["ID_Animal"].str.replace(r"\D", "", regex=True).str[-3:]
+    )
+
+
+def charger_session(path):
+    """Lit un DB_*.csv avec TIMESTAMP numérique et LEVER_PRESS en texte."""
+    df = pd.read_csv(path, dtype={'LEVER_PRESS': str})
+    df['TIMESTAMP'] = pd.to_numeric(df['TIMESTAMP'], errors='coerce')
+    return df.dropna(subset=['TIMESTAMP']).reset_index(drop=True)
+
+
+def rfids_de(df):
+    return sorted({c.split('_')[-1] for c in df.columns if c.startswith("MASS_X_")})
+
+
+def lignes_decalees(df, t_press, offset_ms):
+    """
+    Indices (positions) des lignes situées exactement à t_press + offset_ms,
+    -1 si absentes. Équivalent vectorisé de df[df['TIMESTAMP'] == t0 + offset].
+    """
+    ts = pd.Index(df['TIMESTAMP'].to_numpy(dtype=float))
+    if not ts.is_unique:
+        premiers = ~ts.duplicated(keep='first')
+        pos = np.flatnonzero(premiers)
+        idx = ts[premiers].get_indexer(np.asarray(t_press, dtype=float) + offset_ms)
+        return np.where(idx >= 0, pos[idx], -1)
+    return ts.get_indexer(np.asarray(t_press, dtype=float) + offset_ms)
+
+
+def charger_ranks(arche_csv):
+    """Dictionnaire suffixe RFID (3 derniers chiffres) -> rank ("1", "2", "3")."""
+    df = pd.read_csv(Path(arche_csv), dtype=str)
+    suffixes = df["ID_Animal"].str.replace(r"\D", "", regex=True).str[-3:]
+    return dict(zip(suffixes, df["rank"]))
+
+
+def selectionner_sessions(dossier, n_animaux=None, rank_value=None, min_appuis=0, motif="DB*.csv"):
+    """
+    DB_*.csv de dossier qui satisfont les critères, d'après catalogue.sqlite
+    (écrit par le prétraitement) : nombre d'animaux, présence d'un animal du
+    rank choisi ("1", "2", "3" ou "male"), nombre minimal d'appuis.
+    Les fichiers absents du catalogue (ou sans catalogue, tous) sont gardés
+    sans filtre, avec un avertissement.
+    """
+    fichiers = sorted(glob.glob(os.path.join(dossier, motif)))
+    catalogue = os.path.join(dossier, "catalogue.sqlite")
+    if not os.path.isfile(catalogue):
+        return fichiers
+
+    conditions, params = ["s.n_appuis >= ?"], [min_appuis]
+    if n_animaux is not None:
+        conditions.append("s.n_animaux = ?")
+        params.append(n_animaux)
+    if rank_value is not None:
+        ranks = ["1", "3"] if str(rank_value) == "male" else [str(rank_value)]
+        conditions.append(
+            f"EXISTS (SELECT 1 FROM animaux a WHERE a.session = s.session"
+            f" AND a.rank IN ({','.join('?' * len(ranks))}))")
+        params.extend(ranks)
+    conn = sqlite3.connect(f"file:{Path(catalogue).as_posix()}?mode=ro", uri=True)
+    try:
+        sessions = [r[0] for r in conn.execute(
+            f"SELECT s.session FROM sessions s WHERE {' AND '.join(conditions)} ORDER BY s.session",
+            params)]
+        catalogues = {r[0] for r in conn.execute("SELECT session FROM sessions")}
+    finally:
+        conn.close()
+    # chemins relatifs au dossier : le catalogue reste valable si le dossier est déplacé
+    retenus = [p for p in (os.path.join(dossier, s) for s in sessions) if os.path.isfile(p)]
+    absents = [p for p in fichiers if os.path.basename(p) not in catalogues]
+    if absents:
+        print(f"⚠️ {len(absents)} fichier(s) absent(s) du catalogue, gardés sans filtre "
+              f"(catalogue.py pour les indexer) :")
+        for p in absents:
+            print(f"   {os.path.basename(p)}")
+    return sorted(retenus + absents)
@@ -0,0 +1,202 @@
+import glob
+import os
+import warnings
+from multiprocessing import Pool, cpu_count
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from lmt_commun import charger_session, lignes_decalees, rfids_de
+
+
+BIN_MS = 200
+CONTACT_PX = 50           # distance MASS-MASS considérée comme un contact
+PROXIMITE_PX = 100        # distance MASS-MASS considérée comme une proximité
+REGARD_RAD = np.deg2rad(30)   # A "regarde" B si l'axe MASS→FRONT de A est à moins de 30° de A→B
+
+
+# ---------------- tableaux N animaux ---------------- #
+def tableaux(df, rfids=None):
+    """
+    Positions d'un DB_*.csv en tableaux (T, N, 2) : MASS et FRONT.
+    Les coordonnées négatives (animal non détecté) deviennent NaN.
+    """
+    rfids = rfids or rfids_de(df)
+    def pile(prefix):
+        xs = df[[f"{prefix}_X_{r}" for r in rfids]].to_numpy(dtype=float)
+        ys = df[[f"{prefix}_Y_{r}" for r in rfids]].to_numpy(dtype=float)
+        arr = np.stack([xs, ys], axis=-1)
+        arr[(arr < 0).any(axis=-1)] = np.nan
+        return arr
+    return rfids, df['TIMESTAMP'].to_numpy(dtype=float), pile("MASS"), pile("FRONT")
+
+
+def distances(mass):
+    """Distances MASS-MASS de toutes les paires : (T, N, N)."""
+    d = mass[:, :, None, :] - mass[:, None, :, :]
+    return np.hypot(d[..., 0], d[..., 1])
+
+
+def angles_relatifs(mass, front):
+    """
+    Angle (0..π) entre le cap de A (MASS→FRONT) et la direction A→B : (T, N, N),
+    [t, a, b]. 0 = la tête de A pointe vers B. NaN sur la diagonale.
+    """
+    cap = front - mass                                   # (T, N, 2)
+    vers = mass[:, None, :, :] - mass[:, :, None, :]     # [t, a, b] = B - A
+    a_cap = np.arctan2(cap[..., 1], cap[..., 0])[:, :, None]
+    a_vers = np.arctan2(vers[..., 1], vers[..., 0])
+    ang = np.abs(np.angle(np.exp(1j * (a_vers - a_cap))))
+    ang[:, np.arange(mass.shape[1]), np.arange(mass.shape[1])] = np.nan
+    return ang
+
+
+# ---------------- événements ---------------- #
+def evenements(masque, ts, rfids, bin_ms=BIN_MS, symetrique=True):
+    """
+    Épisodes continus où masque[t, a, b] est vrai (run-length sur l'axe du temps,
+    toutes les paires à la fois). Un trou dans les timestamps coupe l'épisode.
+    Renvoie un DataFrame (rfid_a, rfid_b, debut, fin, duree_ms).
+    """
+    T, N, _ = masque.shape
+    if symetrique:
+        ia, ib = np.triu_indices(N, k=1)
+    else:
+        ia, ib = np.nonzero(~np.eye(N, dtype=bool))
+    m = masque[:, ia, ib]                                  # (T, P)
+
+    contigu = np.zeros(T, dtype=bool)
+    contigu[1:] = np.diff(ts) <= 1.5 * bin_ms
+    suite_prec = np.zeros_like(m)
+    suite_prec[1:] = m[:-1] & contigu[1:, None]
+    suite_suiv = np.zeros_like(m)
+    suite_suiv[:-1] = m[1:] & contigu[1:, None]
+
+    t0, p0 = np.nonzero(m & ~suite_prec)
+    t1, p1 = np.nonzero(m & ~suite_suiv)
+    # même nombre de débuts et de fins par paire : on trie par paire puis temps
+    o0, o1 = np.lexsort((t0, p0)), np.lexsort((t1, p1))
+    t0, p0, t1 = t0[o0], p0[o0], t1[o1]
+
+    rfids = np.asarray(rfids)
+    return pd.DataFrame({
+        "rfid_a": rfids[ia[p0]],
+        "rfid_b": rfids[ib[p0]],
+        "debut": ts[t0],
+        "fin": ts[t1] + bin_ms,
+        "duree_ms": ts[t1] + bin_ms - ts[t0],
+    })
+
+
+def metriques_session(df):
+    """Distances, angles relatifs et événements contact / proximité / regard d'une session."""
+    rfids, ts, mass, front = tableaux(df)
+    dist = distances(mass)
+    ang = angles_relatifs(mass, front)
+    with np.errstate(invalid='ignore'):
+        return {
+            "rfids": rfids,
+            "ts": ts,
+            "distances": dist,
+            "angles": ang,
+            "contacts": evenements(dist < CONTACT_PX, ts, rfids),
+            "proximites": evenements(dist < PROXIMITE_PX, ts, rfids),
+            "regards": evenements((ang < REGARD_RAD) & (dist < PROXIMITE_PX), ts, rfids, symetrique=False),
+        }
+
+
+# ---------------- suivi social après appui ---------------- #
+def suivi_apres_appui(df, fenetre_ms=5000, bin_ms=BIN_MS):
+    """
+    Pour chaque appui et chaque non presseur, sur ±fenetre_ms : distance au
+    presseur et fraction du temps où il regarde le presseur, avant et après.
+    Tout est indexé en bloc (appuis × décalages × animaux).
+    """
+    rfids, ts, mass, front = tableaux(df)
+    press = df['LEVER_PRESS'].isin(rfids).to_numpy()
+    if not press.any():
+        return pd.DataFrame()
+    dist = distances(mass)
+    ang = angles_relatifs(mass, front)
+
+    lignes = np.flatnonzero(press)
+    presseur = pd.Index(rfids).get_indexer(df['LEVER_PRESS'].to_numpy()[lignes])
+    k = np.arange(1, fenetre_ms // bin_ms + 1)
+    t_press = ts[lignes]
+
+    res = []
+    for periode, signe in (("avant", -1), ("apres", 1)):
+        # lignes aux instants exacts t_press ± k·bin_ms (-1 si absentes), (P, K)
+        cibles = t_press[:, None] + signe * k * bin_ms
+        ix = lignes_decalees(df, cibles.ravel(), 0).reshape(cibles.shape)
+        ok = ix >= 0
+        ixc = np.where(ok, ix, 0)
+        d = dist[ixc, :, presseur[:, None]]      # (P, K, N) : [appui, décalage, non presseur]
+        a = ang[ixc, :, presseur[:, None]]
+        d[~ok] = np.nan
+        a[~ok] = np.nan
+        with np.errstate(invalid='ignore'), warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)   # appuis sans aucune donnée
+            regard = np.where(np.isnan(a), np.nan, a < REGARD_RAD)
+            dist_moy = np.nanmean(d, axis=1)
+            regard_moy = np.nanmean(regard, axis=1)
+        for j, r in enumerate(rfids):
+            autre = presseur != j
+            res.append(pd.DataFrame({
+                "appui": np.flatnonzero(autre),
+                "presseur": np.asarray(rfids)[presseur[autre]],
+                "rfid": r,
+                "periode": periode,
+                "distance": dist_moy[autre, j],
+                "regard": regard_moy[autre, j],
+            }))
+    return pd.concat(res, ignore_index=True)
+
+
+def traiter_fichier(path):
+    df = charger_session(path)
+    suivi = suivi_apres_appui(df)
+    if not suivi.empty:
+        suivi.insert(0, "session", os.path.basename(path))
+    contacts = metriques_session(df)["contacts"]
+    contacts.insert(0, "session", os.path.basename(path))
+    return suivi, contacts
+
+
+def plot_suivi(suivi, save_dir):
+    resume = suivi.groupby("periode")[["distance", "regard"]].agg(["mean", "sem"])
+    fig, axs = plt.subplots(1, 2, figsize=(9, 4))
+    for ax, metrique, label in zip(axs, ("distance", "regard"),
+                                   ("Distance au presseur (px)", "% temps à regarder le presseur")):
+        periodes = ["avant", "apres"]
+        m = resume.loc[periodes, (metrique, "mean")].to_numpy()
+        e = resume.loc[periodes, (metrique, "sem")].to_numpy()
+        if metrique == "regard":
+            m, e = m * 100, e * 100
+        ax.bar(["Pré‑press (−5 s)", "Post‑press (+5 s)"], m, yerr=e, capsize=5,
+               color=['grey', 'orange'], alpha=.7)
+        ax.set_ylabel(label)
+    fig.suptitle("Suivi social du presseur (non presseurs, ±SE)")
+    plt.tight_layout()
+    fname = os.path.join(save_dir, "suivi_social_appui")
+    fig.savefig(fname + ".png", dpi=300)
+    fig.savefig(fname + ".eps", format="eps")
+    plt.show()
+
+
+# -------------------------- MAIN ----------------------------
+if __name__ == "__main__":
+    save_dir = r"C:\Users\I9_1\Desktop\LMT"
+    csv_paths = glob.glob(os.path.join(save_dir, "dataframeM2", "DB*.csv"))
+    if not csv_paths:
+        raise FileNotFoundError("Aucun DB_*.csv trouvé")
+
+    with Pool(processes=cpu_count()) as pool:
+        resultats = pool.map(traiter_fichier, csv_paths)
+
+    suivi = pd.concat([s for s, _ in resultats], ignore_index=True)
+    contacts = pd.concat([c for _, c in resultats], ignore_index=True)
+    contacts.to_csv(os.path.join(save_dir, "contacts.csv"), index=False)
+    print(f"{len(contacts)} contacts, durée médiane {contacts['duree_ms'].median() / 1000:.1f} s")
+    plot_suivi(suivi, save_dir)
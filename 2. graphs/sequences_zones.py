@@ -0,0 +1,228 @@
+import glob
+import os
+from collections import Counter
+from multiprocessing import Pool, cpu_count
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from lmt_commun import ZLIST, charger_session, rfids_de, zones_vectorisees
+
+
+BIN_MS = 200
+FENETRE_APPUI_MS = 10_000      # fenêtre post-appui pour conditionner transitions / séjours / chemins
+INCONNU = -2                   # position manquante (hors zone = -1)
+BINS_DUREE = np.logspace(np.log10(BIN_MS), np.log10(600_000), 30)
+
+
+# ---------------- run-length ---------------- #
+def visites(df, bin_ms=BIN_MS):
+    """
+    Série de zones complète (tous les bins) de chaque animal, encodée en
+    visites : rfid, zone (0 = A, 1 = B, 2 = C, -1 = hors zone), entree, sortie, duree_ms.
+    Une position manquante ou un trou dans les timestamps termine la visite.
+    Tous les animaux sont encodés d'un bloc (tableau animaux × temps).
+    """
+    rfids = rfids_de(df)
+    ts = df['TIMESTAMP'].to_numpy(dtype=float)
+    x = df[[f"MASS_X_{r}" for r in rfids]].to_numpy(dtype=float).T    # (N, T)
+    y = df[[f"MASS_Y_{r}" for r in rfids]].to_numpy(dtype=float).T
+    codes = zones_vectorisees(x, y)
+    with np.errstate(invalid='ignore'):
+        codes[np.isnan(x) | np.isnan(y) | (x < 0) | (y < 0)] = INCONNU
+
+    N, T = codes.shape
+    if not T:
+        return pd.DataFrame(columns=["rfid", "zone", "entree", "sortie", "duree_ms"])
+    trou = np.zeros(T, dtype=bool)
+    trou[1:] = np.diff(ts) > 1.5 * bin_ms
+    debut = np.ones_like(codes, dtype=bool)
+    debut[:, 1:] = (codes[:, 1:] != codes[:, :-1]) | trou[None, 1:]
+
+    n, t0 = np.nonzero(debut)       # trié par animal puis par temps
+    meme = np.append(n[1:] == n[:-1], False)
+    t_suiv = np.append(t0[1:], T)
+    t1 = np.where(meme, t_suiv, T) - 1
+    zone = codes[n, t0]
+
+    v = pd.DataFrame({
+        "rfid": np.asarray(rfids)[n],
+        "zone": zone,
+        "entree": ts[t0],
+        "sortie": ts[t1] + bin_ms,
+    })
+    v["duree_ms"] = v["sortie"] - v["entree"]
+    return v[v["zone"] != INCONNU].reset_index(drop=True)
+
+
+def _apres_appui(t, t_press, fenetre_ms):
+    """True si t tombe dans [t_press, t_press + fenetre_ms] d'au moins un appui."""
+    t_press = np.sort(np.asarray(t_press, dtype=float))
+    if not len(t_press):
+        return np.zeros(len(t), dtype=bool)
+    i = np.searchsorted(t_press, t, side='right') - 1
+    return (i >= 0) & (t <= t_press[np.clip(i, 0, None)] + fenetre_ms)
+
+
+def appuis(df):
+    rfids = rfids_de(df)
+    press = df[df['LEVER_PRESS'].isin(rfids)]
+    return press['TIMESTAMP'].to_numpy(dtype=float), press['LEVER_PRESS'].to_numpy()
+
+
+def marquer_post_appui(v, t_press, r_press, fenetre_ms=FENETRE_APPUI_MS):
+    """Colonne post_appui : la visite commence dans la fenêtre d'un appui d'un autre animal."""
+    post = np.zeros(len(v), dtype=bool)
+    for r in v["rfid"].unique():
+        sel = (v["rfid"] == r).to_numpy()
+        post[sel] = _apres_appui(v["entree"].to_numpy()[sel], t_press[r_press != r], fenetre_ms)
+    v = v.copy()
+    v["post_appui"] = post
+    return v
+
+
+def _continues(v, bin_ms=BIN_MS):
+    """
+    Numéro de séquence continue de chaque visite : une nouvelle séquence commence
+    à chaque changement d'animal ou quand la visite ne suit pas directement la
+    précédente (position inconnue ou trou dans les timestamps entre les deux).
+    """
+    rfid = v["rfid"].to_numpy()
+    suite = np.zeros(len(v), dtype=bool)
+    suite[1:] = (rfid[1:] == rfid[:-1]) & (
+        v["entree"].to_numpy()[1:] - v["sortie"].to_numpy()[:-1] < bin_ms / 2)
+    return np.cumsum(~suite)
+
+
+def transitions(v):
+    """
+    Transitions entre visites de zone successives d'un même animal (les passages
+    hors zone sont ignorés : A → hors zone → B compte A → B). Deux visites
+    séparées par une position inconnue ou un trou ne forment pas une transition.
+    Renvoie les matrices 3×3 (départ × arrivée) baseline et post-appui.
+    """
+    seq = _continues(v)[(v["zone"] >= 0).to_numpy()]
+    z = v[v["zone"] >= 0]
+    de, vers = z["zone"].to_numpy()[:-1], z["zone"].to_numpy()[1:]
+    meme = seq[:-1] == seq[1:]
+    post = z["post_appui"].to_numpy()[1:]
+    mats = {}
+    for nom, sel in (("baseline", meme & ~post), ("post_appui", meme & post)):
+        m = np.zeros((len(ZLIST), len(ZLIST)), dtype=np.int64)
+        np.add.at(m, (de[sel], vers[sel]), 1)
+        mats[nom] = m
+    return mats
+
+
+def durees(v):
+    """Histogrammes des durées de séjour par zone, baseline / post-appui."""
+    res = {}
+    for nom, post in (("baseline", False), ("post_appui", True)):
+        z = v[(v["zone"] >= 0) & (v["post_appui"] == post)]
+        res[nom] = np.stack([
+            np.histogram(z.loc[z["zone"] == i, "duree_ms"], BINS_DUREE)[0] for i in range(len(ZLIST))
+        ])
+    return res
+
+
+def chemins(v, t_press, r_press, fenetre_ms=FENETRE_APPUI_MS):
+    """
+    Chemin de zones de chaque non presseur dans la fenêtre après chaque appui,
+    zone occupée à l'appui comprise (ex. "A→C→B"). Compte par chemin.
+    """
+    z = v[v["zone"] >= 0]
+    if not len(z) or not len(t_press):
+        return Counter()
+    rfids, g = np.unique(z["rfid"].to_numpy(), return_inverse=True)
+    entree, sortie = z["entree"].to_numpy(), z["sortie"].to_numpy()
+
+    # clé (animal, temps) : un seul searchsorted pour tous les couples appui × non presseur
+    t0 = min(entree.min(), np.min(t_press))
+    large = max(sortie.max(), np.max(t_press) + fenetre_ms) - t0 + 1
+    cle_entree, cle_sortie = g * large + (entree - t0), g * large + (sortie - t0)
+    p, a = np.nonzero(r_press[:, None] != rfids[None, :])
+    debut = a * large + (t_press[p] - t0)
+    # visites qui chevauchent [t, t + fenetre]
+    i0 = np.searchsorted(cle_sortie, debut, side='right')
+    i1 = np.searchsorted(cle_entree, debut + fenetre_ms, side='right')
+
+    n = np.clip(i1 - i0, 0, None)
+    couple = np.repeat(np.arange(len(i0)), n)
+    idx = np.repeat(i0, n) + np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+    zone = z["zone"].to_numpy()[idx]
+    # zones répétées consécutives fusionnées
+    garde = np.ones(len(idx), dtype=bool)
+    garde[1:] = (couple[1:] != couple[:-1]) | (zone[1:] != zone[:-1])
+    lettres = pd.Series(np.asarray(list(ZLIST))[zone[garde]])
+    chemins_ = lettres.groupby(couple[garde]).agg("→".join)
+    return Counter(chemins_.value_counts().to_dict())
+
+
+def process_file(path, fenetre_ms=FENETRE_APPUI_MS):
+    df = charger_session(path)
+    t_press, r_press = appuis(df)
+    v = marquer_post_appui(visites(df), t_press, r_press, fenetre_ms)
+    return transitions(v), durees(v), chemins(v, t_press, r_press, fenetre_ms)
+
+
+def fusionner(resultats):
+    mats = {k: sum(r[0][k] for r in resultats) for k in ("baseline", "post_appui")}
+    hist = {k: sum(r[1][k] for r in resultats) for k in ("baseline", "post_appui")}
+    ch = sum((r[2] for r in resultats), Counter())
+    return mats, hist, ch
+
+
+# ---------------- figures ---------------- #
+def plot(mats, hist, ch, save_dir=None, n_chemins=10):
+    fig, axs = plt.subplots(2, 2, figsize=(12, 10))
+
+    for ax, nom in zip(axs[0], ("baseline", "post_appui")):
+        m = mats[nom].astype(float)
+        m /= np.where(m.sum(axis=1, keepdims=True), m.sum(axis=1, keepdims=True), 1)
+        ax.imshow(m, vmin=0, vmax=1, cmap='Oranges')
+        for i in range(len(ZLIST)):
+            for j in range(len(ZLIST)):
+                ax.text(j, i, f"{m[i, j] * 100:.0f}%\n(n={mats[nom][i, j]})", ha='center', va='center')
+        ax.set_xticks(range(len(ZLIST)), list(ZLIST))
+        ax.set_yticks(range(len(ZLIST)), list(ZLIST))
+        ax.set_xlabel('Zone d\'arrivée')
+        ax.set_ylabel('Zone de départ')
+        ax.set_title(f"Transitions – {nom}")
+
+    centres = np.sqrt(BINS_DUREE[:-1] * BINS_DUREE[1:]) / 1000
+    for i, (z, c) in enumerate(zip(ZLIST, ['blue', 'orange', 'green'])):
+        for nom, style in (("baseline", '--'), ("post_appui", '-')):
+            h = hist[nom][i]
+            if h.sum():
+                axs[1, 0].plot(centres, h / h.sum(), style, color=c, label=f"{z} – {nom}")
+    axs[1, 0].set_xscale('log')
+    axs[1, 0].set_xlabel('Durée de séjour (s)')
+    axs[1, 0].set_ylabel('Proportion des visites')
+    axs[1, 0].legend(fontsize=7)
+
+    top = ch.most_common(n_chemins)
+    if top:
+        axs[1, 1].barh([c for c, _ in top][::-1], [n for _, n in top][::-1], color='orange', alpha=.7)
+    axs[1, 1].set_xlabel('Nombre (appui × non presseur)')
+    axs[1, 1].set_title(f"Chemins dans les {FENETRE_APPUI_MS // 1000} s après l'appui")
+
+    plt.tight_layout()
+    if save_dir:
+        fname = os.path.join(save_dir, "sequences_zones")
+        fig.savefig(fname + ".png", dpi=300)
+        fig.savefig(fname + ".eps", format="eps")
+    plt.show()
+
+
+# ------------------ exécution ------------------
+if __name__ == "__main__":
+    save_dir = r"C:\Users\I9_1\Desktop\LMT"
+    csv_paths = glob.glob(os.path.join(save_dir, "dataframeM2", "DB*.csv"))
+    if not csv_paths:
+        raise FileNotFoundError("Aucun CSV trouvé")
+
+    with Pool(processes=cpu_count()) as pool:
+        resultats = pool.map(process_file, csv_paths)
+
+    plot(*fusionner(resultats), save_dir=save_dir)
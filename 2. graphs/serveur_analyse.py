@@ -0,0 +1,306 @@
+import glob
+import json
+import os
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+from lmt_commun import (ZLIST, charger_session, charger_suffixes_rank,
+                        lignes_decalees, rfids_de, zones_vectorisees)
+
+
+CIBLES = {"levier": (250, 350), "feeder": (265, 65)}
+BINS_ORIENTATION = np.linspace(0, 2 * np.pi, 13)
+
+
+# ---------------- calculs (une session) ---------------- #
+def _valides(*cols):
+    pile = np.vstack(cols)
+    return ~np.isnan(pile).any(axis=0) & (np.nan_to_num(pile, nan=-1).min(axis=0) >= 0)
+
+
+def occupation_zones(df, rfids_rank, offset_ms):
+    """Nombre d'observations par zone des animaux rank (non presseurs) à t_press + offset_ms."""
+    counts = np.zeros(len(ZLIST), dtype=np.int64)
+    press = df[df['LEVER_PRESS'].isin(rfids_rank)]
+    lignes = lignes_decalees(df, press['TIMESTAMP'], offset_ms)
+    ok = lignes >= 0
+    lignes, presseurs = lignes[ok], press['LEVER_PRESS'].to_numpy()[ok]
+
+    for r in rfids_rank:
+        if f"MASS_X_{r}" not in df.columns:
+            continue
+        x = df[f"MASS_X_{r}"].to_numpy(dtype=float)[lignes]
+        y = df[f"MASS_Y_{r}"].to_numpy(dtype=float)[lignes]
+        garde = (presseurs != r) & _valides(x, y)
+        codes = zones_vectorisees(x[garde], y[garde])
+        counts += np.bincount(codes[codes >= 0], minlength=len(ZLIST))
+    return counts
+
+
+def taux_transitions(df, delay_before, delay_after):
+    """
+    Transitions A/C → B des deux non presseurs (sessions à 3 animaux).
+    Renvoie {1: [nb vers B, total], 3: [nb vers B, total]} comme process_file.
+    """
+    res = {1: [0, 0], 3: [0, 0]}
+    rfid_ids = rfids_de(df)
+    if len(rfid_ids) != 3:
+        return res
+
+    press = df[df['LEVER_PRESS'].isin(rfid_ids)]
+    lb = lignes_decalees(df, press['TIMESTAMP'], delay_before)
+    la = lignes_decalees(df, press['TIMESTAMP'], delay_after)
+    ok = (lb >= 0) & (la >= 0)
+    lb, la, presseurs = lb[ok], la[ok], press['LEVER_PRESS'].to_numpy()[ok]
+
+    for r_press in rfid_ids:
+        sel = presseurs == r_press
+        others = [r for r in rfid_ids if r != r_press]
+        for rank, rfid in zip([1, 3], others):
+            xb = df[f"MASS_X_{rfid}"].to_numpy(dtype=float)[lb[sel]]
+            yb = df[f"MASS_Y_{rfid}"].to_numpy(dtype=float)[lb[sel]]
+            xa = df[f"MASS_X_{rfid}"].to_numpy(dtype=float)[la[sel]]
+            ya = df[f"MASS_Y_{rfid}"].to_numpy(dtype=float)[la[sel]]
+            garde = _valides(xb, yb, xa, ya)
+            zb = zones_vectorisees(xb[garde], yb[garde])
+            za = zones_vectorisees(xa[garde], ya[garde])
+            depart = (zb == 0) | (zb == 2)
+            res[rank][0] += int((za[depart] == 1).sum())
+            res[rank][1] += int(depart.sum())
+    return res
+
+
+def _ajouter_angles(hist, mx, my, fx, fy, target):
+    """Ajoute à hist (par zone) les angles tête/cible des points valides."""
+    tx, ty = target
+    garde = _valides(mx, my, fx, fy)
+    mx, my, fx, fy = mx[garde], my[garde], fx[garde], fy[garde]
+    v1x, v1y, v2x, v2y = fx - mx, fy - my, tx - mx, ty - my
+    z = zones_vectorisees(mx, my)
+    garde = (z >= 0) & (np.hypot(v1x, v1y) > 0) & (np.hypot(v2x, v2y) > 0)
+    ang = (np.arctan2(v2y, v2x) - np.arctan2(v1y, v1x)) % (2 * np.pi)
+    for i, zone in enumerate(ZLIST):
+        h, _ = np.histogram(ang[garde & (z == i)], BINS_ORIENTATION)
+        hist[zone] += h
+
+
+def histogramme_orientation(df, rfids_rank, target, delay_ms):
+    """Histogramme (12 secteurs) par zone de l'angle tête/cible à t_press + delay_ms."""
+    hist = {z: np.zeros(len(BINS_ORIENTATION) - 1, dtype=np.int64) for z in ZLIST}
+    press = df[df['LEVER_PRESS'].isin(rfids_rank)]
+    lignes = lignes_decalees(df, press['TIMESTAMP'], delay_ms)
+    ok = lignes >= 0
+    lignes, presseurs = lignes[ok], press['LEVER_PRESS'].to_numpy()[ok]
+
+    for r in rfids_rank:
+        if f"MASS_X_{r}" not in df.columns:
+            continue
+        autres = presseurs != r
+        mx, my, fx, fy = (df[f"{m}_{r}"].to_numpy(dtype=float)[lignes[autres]]
+                          for m in ("MASS_X", "MASS_Y", "FRONT_X", "FRONT_Y"))
+        _ajouter_angles(hist, mx, my, fx, fy, target)
+    return hist
+
+
+def tirage_aleatoire(tailles, n, graine=42):
+    """
+    Lignes tirées sans remise dans la concaténation de sessions de tailles données,
+    comme df.sample(n, random_state=graine) sur pd.concat(...) : {i_session: lignes}.
+    """
+    debuts = np.concatenate([[0], np.cumsum(tailles)[:-1]]).astype(np.int64)
+    tirage = np.random.RandomState(graine).choice(int(np.sum(tailles)), size=n, replace=False)
+    session = np.searchsorted(debuts, tirage, side='right') - 1
+    return {i: np.sort(tirage[session == i] - debuts[i]) for i in np.unique(session)}
+
+
+def baseline_aleatoire(df, lignes, target, occupation, hist):
+    """Ajoute la baseline (tous les animaux, aux lignes tirées) : occupation par zone et angles."""
+    for r in rfids_de(df):
+        mx, my, fx, fy = (df[f"{m}_{r}"].to_numpy(dtype=float)[lignes]
+                          for m in ("MASS_X", "MASS_Y", "FRONT_X", "FRONT_Y"))
+        ok = _valides(mx, my)
+        codes = zones_vectorisees(mx[ok], my[ok])
+        occupation += np.bincount(codes[codes >= 0], minlength=len(ZLIST))
+        _ajouter_angles(hist, mx, my, fx, fy, target)
+
+
+# ---------------- cache LRU ---------------- #
+class CacheSessions:
+    """
+    Garde en mémoire les DB_*.csv déjà chargés. Les sessions les moins
+    récemment utilisées sont évincées dès que la taille dépasse memoire_max.
+    Un fichier réexporté (date de modification ou taille différente) est relu.
+    """
+
+    def __init__(self, memoire_max=4 * 1024**3):
+        self.memoire_max = memoire_max
+        self.memoire = 0
+        self._sessions = OrderedDict()   # path -> (df, taille, signature)
+        self._verrou = threading.Lock()
+
+    @staticmethod
+    def _signature(path):
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+
+    def get(self, path):
+        signature = self._signature(path)
+        with self._verrou:
+            if path in self._sessions and self._sessions[path][2] == signature:
+                self._sessions.move_to_end(path)
+                return self._sessions[path][0]
+
+        df = charger_session(path)
+        taille = int(df.memory_usage(deep=True).sum())
+
+        with self._verrou:
+            ancien = self._sessions.get(path)
+            if ancien is None or ancien[2] != signature:
+                if ancien is not None:
+                    self.memoire -= ancien[1]
+                self._sessions[path] = (df, taille, signature)
+                self.memoire += taille
+            self._sessions.move_to_end(path)
+            while self.memoire > self.memoire_max and len(self._sessions) > 1:
+                _, (_, t, _) = self._sessions.popitem(last=False)
+                self.memoire -= t
+            return self._sessions[path][0]
+
+    def etat(self):
+        with self._verrou:
+            return {
+                "sessions": list(self._sessions),
+                "memoire": self.memoire,
+                "memoire_max": self.memoire_max,
+            }
+
+
+# ---------------- service ---------------- #
+class ServeurAnalyse:
+    def __init__(self, csv_glob, arche_csv, memoire_max=4 * 1024**3):
+        self.csv_glob = csv_glob
+        self.arche_csv = arche_csv
+        self.cache = CacheSessions(memoire_max)
+        self._suffixes = {}
+
+    def chemins(self):
+        return sorted(glob.glob(self.csv_glob))
+
+    def rfids_rank(self, df, rank_value):
+        rank_value = str(rank_value)
+        if rank_value not in self._suffixes:
+            self._suffixes[rank_value] = charger_suffixes_rank(self.arche_csv, rank_value)
+        return [r for r in rfids_de(df) if r[-3:] in self._suffixes[rank_value]]
+
+    def sessions_rank(self, rank):
+        """Sessions contenant au moins un animal du rank (celles que les scripts concaténaient)."""
+        return [p for p in self.chemins() if self.rfids_rank(self.cache.get(p), rank)]
+
+    def rfids(self, rank):
+        return sorted({r for p in self.sessions_rank(rank) for r in self.rfids_rank(self.cache.get(p), rank)})
+
+    def occupation(self, rank, offset):
+        total = np.zeros(len(ZLIST), dtype=np.int64)
+        for p in self.chemins():
+            df = self.cache.get(p)
+            total += occupation_zones(df, self.rfids_rank(df, rank), offset)
+        return dict(zip(ZLIST, total.tolist()))
+
+    def transitions(self, before, after):
+        total = {1: [0, 0], 3: [0, 0]}
+        for p in self.chemins():
+            res = taux_transitions(self.cache.get(p), before, after)
+            for rank in total:
+                total[rank][0] += res[rank][0]
+                total[rank][1] += res[rank][1]
+        return {str(k): v for k, v in total.items()}
+
+    def orientation(self, rank, delay, target):
+        total = {z: np.zeros(len(BINS_ORIENTATION) - 1, dtype=np.int64) for z in ZLIST}
+        for p in self.chemins():
+            df = self.cache.get(p)
+            res = histogramme_orientation(df, self.rfids_rank(df, rank), CIBLES[target], delay)
+            for z in ZLIST:
+                total[z] += res[z]
+        out = {z: h.tolist() for z, h in total.items()}
+        out["bins"] = BINS_ORIENTATION.tolist()
+        return out
+
+    def aleatoire(self, rank, n, target, graine=42):
+        chemins = self.sessions_rank(rank)
+        if not chemins:
+            raise ValueError(f"Aucune session avec un animal rank {rank}")
+        occupation = np.zeros(len(ZLIST), dtype=np.int64)
+        hist = {z: np.zeros(len(BINS_ORIENTATION) - 1, dtype=np.int64) for z in ZLIST}
+        tailles = [len(self.cache.get(p)) for p in chemins]
+        for i, lignes in tirage_aleatoire(tailles, n, graine).items():
+            baseline_aleatoire(self.cache.get(chemins[i]), lignes, CIBLES[target], occupation, hist)
+        out = {z: h.tolist() for z, h in hist.items()}
+        out["occupation"] = dict(zip(ZLIST, occupation.tolist()))
+        out["bins"] = BINS_ORIENTATION.tolist()
+        return out
+
+    def repondre(self, route, params):
+        def p(nom, defaut):
+            return params.get(nom, [defaut])[0]
+
+        if route == "/occupation":
+            return self.occupation(p("rank", "1"), float(p("offset", 5000)))
+        if route == "/transitions":
+            return self.transitions(float(p("before", -5000)), float(p("after", 3000)))
+        if route == "/orientation":
+            return self.orientation(p("rank", "1"), float(p("delay", 1000)), p("target", "feeder"))
+        if route == "/aleatoire":
+            return self.aleatoire(p("rank", "1"), int(p("n", 10_000)), p("target", "feeder"), int(p("graine", 42)))
+        if route == "/rfids":
+            return {"rfids": self.rfids(p("rank", "1"))}
+        if route == "/etat":
+            return self.cache.etat()
+        raise KeyError(route)
+
+
+def creer_serveur(service, hote="127.0.0.1", port=8765):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            try:
+                code, corps = 200, service.repondre(url.path, parse_qs(url.query))
+            except KeyError as e:
+                code, corps = 404, {"erreur": f"inconnu : {e}"}
+            except ValueError as e:
+                code, corps = 400, {"erreur": str(e)}
+            data = json.dumps(corps).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return ThreadingHTTPServer((hote, port), Handler)
+
+
+# -------------------------- MAIN ----------------------------
+if __name__ == "__main__":
+    service = ServeurAnalyse(
+        csv_glob=r"C:\Users\I9_1\Desktop\LMT\dataframeM2\DB*.csv",
+        arche_csv=r"C:\Users\I9_1\Desktop\LMT\mice_archetypes_all_data.csv",
+        memoire_max=8 * 1024**3,
+    )
+    # préchargement : les premières requêtes n'attendent pas la lecture des CSV
+    for p in service.chemins():
+        service.cache.get(p)
+    print(f"📂 {len(service.chemins())} sessions — {service.cache.memoire / 1e6:.0f} Mo en mémoire")
+
+    serveur = creer_serveur(service)
+    print(f"✅ Serveur d'analyse sur http://{serveur.server_address[0]}:{serveur.server_address[1]}")
+    try:
+        serveur.serve_forever()
+    except KeyboardInterrupt:
+        serveur.server_close()
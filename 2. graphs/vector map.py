@@ -1,67 +1,209 @@
+import os
+from multiprocessing import Pool, cpu_count
+
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 
-
-df = pd.read_csv(r"C:\Users\I9_1\Desktop\LMT\dataframeM2\DB_03_31032021.csv")
-df['TIMESTAMP'] = pd.to_numeric(df['TIMESTAMP'], errors='coerce')
-rfid_ids = sorted(set(col.split('_')[-1] for col in df.columns if 'DIRECTION_' in col))
-
-colors = ['red', 'green', 'blue']
-rfid_colors = dict(zip(rfid_ids, colors))
-
-fig, axs = plt.subplots(1, 3, figsize=(18, 6))
-titles = ['2 sec avant appui', 'Moment de l\'appui', '2 sec après appui']
-time_offsets = [-2000, 0, 2000]
-
-# Lignes avec appui levier
-df_lever = df[df['LEVER_PRESS'] != 0]
-total_presses = len(df_lever)
-
-# Pour chaque offset temporel, tracer les flèches
-for ax, title, offset in zip(axs, titles, time_offsets):
-    ax.set_title(title)
-    ax.set_xlabel('MASS_X')
-    ax.set_ylabel('MASS_Y')
-
-    for idx, lever_row in df_lever.iterrows():
-        target_time = lever_row['TIMESTAMP'] + offset
-
-        # Convertir LEVER_PRESS en RFID formaté (12 chiffres avec zéros en tête)
-        try:
-            lever_rfid = f"{int(float(lever_row['LEVER_PRESS'])):012d}"
-        except (ValueError, TypeError):
-            continue  # Ignore cette ligne si la valeur n'est pas convertible
-
-        # Trouver la ligne la plus proche dans le temps
-        closest_idx = (df['TIMESTAMP'] - target_time).abs().idxmin()
-        row = df.loc[closest_idx]
-
-        for rfid in rfid_ids:
-            if rfid == lever_rfid:
-                continue  # Ne pas tracer l’animal qui a appuyé
-
-            x_col = f'MASS_X_{rfid}'
-            y_col = f'MASS_Y_{rfid}'
-            dir_col = f'DIRECTION_{rfid}'
-
-            if pd.notna(row[x_col]) and pd.notna(row[y_col]) and pd.notna(row[dir_col]):
-                x = row[x_col]
-                y = row[y_col]
-                direction = row[dir_col]
-                arrow_length = 10
-                dx = arrow_length * np.cos(direction)
-                dy = arrow_length * np.sin(direction)
-
-                ax.arrow(x, y, dx, dy, head_width=2, head_length=2,
-                         fc=rfid_colors[rfid], ec=rfid_colors[rfid])
-
-    ax.grid(True)
-    ax.axis('equal')
-
-handles = [plt.Line2D([], [], color=rfid_colors[rfid], lw=3, label=f'RFID {rfid}') for rfid in rfid_ids]
-handles.append(plt.Line2D([], [], color='black', lw=0, label=f'Total appuis levier : {total_presses}'))
-axs[2].legend(handles=handles, loc='upper right')
-
-plt.tight_layout()
-plt.show()
+from lmt_commun import ARENE, charger_session, lignes_decalees, rfids_de, selectionner_sessions
+
+
+TIME_OFFSETS = [-2000, 0, 2000]
+TITRES = ['2 sec avant appui', 'Moment de l\'appui', '2 sec après appui']
+RESOLUTION = 25     # taille des cases du champ de cap (px)
+N_MIN = 5           # cases avec moins d'échantillons non tracées
+
+
+# ---------------- flèches brutes (une session) ---------------- #
+def fleches_session(csv_path):
+    df = pd.read_csv(csv_path)
+    df['TIMESTAMP'] = pd.to_numeric(df['TIMESTAMP'], errors='coerce')
+    rfid_ids = sorted(set(col.split('_')[-1] for col in df.columns if 'DIRECTION_' in col))
+
+    colors = ['red', 'green', 'blue']
+    rfid_colors = dict(zip(rfid_ids, colors))
+
+    fig, axs = plt.subplots(1, 3, figsize=(18, 6))
+
+    # Lignes avec appui levier
+    df_lever = df[df['LEVER_PRESS'] != 0]
+    total_presses = len(df_lever)
+
+    # Pour chaque offset temporel, tracer les flèches
+    for ax, title, offset in zip(axs, TITRES, TIME_OFFSETS):
+        ax.set_title(title)
+        ax.set_xlabel('MASS_X')
+        ax.set_ylabel('MASS_Y')
+
+        for idx, lever_row in df_lever.iterrows():
+            target_time = lever_row['TIMESTAMP'] + offset
+
+            # Convertir LEVER_PRESS en RFID formaté (12 chiffres avec zéros en tête)
+            try:
+                lever_rfid = f"{int(float(lever_row['LEVER_PRESS'])):012d}"
+            except (ValueError, TypeError):
+                continue  # Ignore cette ligne si la valeur n'est pas convertible
+
+            # Trouver la ligne la plus proche dans le temps
+            closest_idx = (df['TIMESTAMP'] - target_time).abs().idxmin()
+            row = df.loc[closest_idx]
+
+            for rfid in rfid_ids:
+                if rfid == lever_rfid:
+                    continue  # Ne pas tracer l’animal qui a appuyé
+
+                x_col = f'MASS_X_{rfid}'
+                y_col = f'MASS_Y_{rfid}'
+                dir_col = f'DIRECTION_{rfid}'
+
+                if pd.notna(row[x_col]) and pd.notna(row[y_col]) and pd.notna(row[dir_col]):
+                    x = row[x_col]
+                    y = row[y_col]
+                    direction = row[dir_col]
+                    arrow_length = 10
+                    dx = arrow_length * np.cos(direction)
+                    dy = arrow_length * np.sin(direction)
+
+                    ax.arrow(x, y, dx, dy, head_width=2, head_length=2,
+                             fc=rfid_colors[rfid], ec=rfid_colors[rfid])
+
+        ax.grid(True)
+        ax.axis('equal')
+
+    handles = [plt.Line2D([], [], color=rfid_colors[rfid], lw=3, label=f'RFID {rfid}') for rfid in rfid_ids]
+    handles.append(plt.Line2D([], [], color='black', lw=0, label=f'Total appuis levier : {total_presses}'))
+    axs[2].legend(handles=handles, loc='upper right')
+
+    plt.tight_layout()
+    plt.show()
+
+
+# ---------------- champ de cap (toutes les sessions) ---------------- #
+class ChampCap:
+    """
+    Champ de cap des non presseurs : pour chaque décalage péri-appui et chaque
+    case de la grille, sommes de cos / sin de DIRECTION et effectif.
+    Les sommes s'additionnent d'une session à l'autre (fusionner), la taille
+    ne dépend pas du nombre d'appuis.
+    """
+
+    def __init__(self, resolution=RESOLUTION, arene=ARENE, offsets=TIME_OFFSETS):
+        self.resolution = resolution
+        self.arene = arene
+        self.offsets = list(offsets)
+        (x0, x1), (y0, y1) = arene
+        self.nx = int(np.ceil((x1 - x0) / resolution))
+        self.ny = int(np.ceil((y1 - y0) / resolution))
+        self.cos = np.zeros((len(self.offsets), self.ny, self.nx))
+        self.sin = np.zeros_like(self.cos)
+        self.n = np.zeros(self.cos.shape, dtype=np.int64)
+        self.n_appuis = 0
+
+    def ajouter(self, i_offset, x, y, direction):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        direction = np.asarray(direction, dtype=float)
+        (x0, _), (y0, _) = self.arene
+        ix = np.floor((x - x0) / self.resolution)
+        iy = np.floor((y - y0) / self.resolution)
+        ok = (ix >= 0) & (ix < self.nx) & (iy >= 0) & (iy < self.ny) & ~np.isnan(direction)
+        flat = iy[ok].astype(np.int64) * self.nx + ix[ok].astype(np.int64)
+        taille = self.nx * self.ny
+        d = direction[ok]
+        self.cos[i_offset] += np.bincount(flat, np.cos(d), taille).reshape(self.ny, self.nx)
+        self.sin[i_offset] += np.bincount(flat, np.sin(d), taille).reshape(self.ny, self.nx)
+        self.n[i_offset] += np.bincount(flat, minlength=taille).reshape(self.ny, self.nx)
+
+    def fusionner(self, autre):
+        if (autre.resolution, autre.arene, autre.offsets) != (self.resolution, self.arene, self.offsets):
+            raise ValueError("Champs de résolution, d'étendue ou de décalages différents.")
+        self.cos += autre.cos
+        self.sin += autre.sin
+        self.n += autre.n
+        self.n_appuis += autre.n_appuis
+        return self
+
+    def moyennes(self):
+        """Cap moyen circulaire, longueur résultante (0..1) et effectif par case."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            longueur = np.hypot(self.cos, self.sin) / self.n
+        return np.arctan2(self.sin, self.cos), longueur, self.n
+
+    def centres(self):
+        (x0, _), (y0, _) = self.arene
+        xs = x0 + (np.arange(self.nx) + 0.5) * self.resolution
+        ys = y0 + (np.arange(self.ny) + 0.5) * self.resolution
+        return np.meshgrid(xs, ys)
+
+
+def champ_session(path, resolution=RESOLUTION, offsets=TIME_OFFSETS):
+    """Champ de cap d'un DB_*.csv : positions des non presseurs à chaque décalage."""
+    champ = ChampCap(resolution, offsets=offsets)
+    df = charger_session(path)
+    rfids = rfids_de(df)
+    press = df[df['LEVER_PRESS'].isin(rfids)]
+    t_press = press['TIMESTAMP'].to_numpy(dtype=float)
+    presseur = press['LEVER_PRESS'].to_numpy()
+    champ.n_appuis = len(t_press)
+    if not len(t_press):
+        return champ
+
+    for i, offset in enumerate(offsets):
+        lignes = lignes_decalees(df, t_press, offset)
+        for r in rfids:
+            sel = lignes[(lignes >= 0) & (presseur != r)]
+            champ.ajouter(
+                i,
+                df[f"MASS_X_{r}"].to_numpy(dtype=float)[sel],
+                df[f"MASS_Y_{r}"].to_numpy(dtype=float)[sel],
+                df[f"DIRECTION_{r}"].to_numpy(dtype=float)[sel],
+            )
+    return champ
+
+
+def plot_champ(champ, save_dir=None, n_min=N_MIN):
+    angle, longueur, n = champ.moyennes()
+    X, Y = champ.centres()
+    (x0, x1), (y0, y1) = champ.arene
+
+    fig, axs = plt.subplots(1, len(champ.offsets), figsize=(6 * len(champ.offsets), 6))
+    for i, (ax, title) in enumerate(zip(np.atleast_1d(axs), TITRES)):
+        ok = n[i] >= n_min
+        ax.imshow(np.where(n[i] > 0, n[i], np.nan), origin='lower', extent=(x0, x1, y0, y1),
+                  cmap='Greys', alpha=.4)
+        q = ax.quiver(X[ok], Y[ok],
+                      longueur[i][ok] * np.cos(angle[i][ok]), longueur[i][ok] * np.sin(angle[i][ok]),
+                      longueur[i][ok], cmap='viridis', clim=(0, 1),
+                      angles='xy', scale_units='xy', scale=1 / champ.resolution, pivot='middle')
+        ax.set_title(f"{title} (n = {int(n[i].sum())})")
+        ax.set_xlabel('MASS_X')
+        ax.set_ylabel('MASS_Y')
+        ax.set_xlim(x0, x1)
+        ax.set_ylim(y0, y1)
+        ax.set_aspect('equal')
+    fig.colorbar(q, ax=axs, label='Longueur résultante (concentration du cap)', shrink=.8)
+    fig.suptitle(f"Cap moyen des non presseurs – {champ.n_appuis} appuis levier")
+    if save_dir:
+        fname = os.path.join(save_dir, "champ_cap")
+        fig.savefig(fname + ".png", dpi=300)
+        fig.savefig(fname + ".eps", format="eps")
+    plt.show()
+
+
+# -------------------------- MAIN ----------------------------
+if __name__ == "__main__":
+    mode = input("Mode (fleches/champ) : ").strip().lower()
+    if mode == "fleches":
+        fleches_session(r"C:\Users\I9_1\Desktop\LMT\dataframeM2\DB_03_31032021.csv")
+    else:
+        save_dir = r"C:\Users\I9_1\Desktop\LMT"
+        csv_paths = selectionner_sessions(os.path.join(save_dir, "dataframeM2"))
+        if not csv_paths:
+            raise FileNotFoundError("Aucun DB_*.csv trouvé")
+
+        # sommes fusionnées au fil des sessions : la mémoire ne dépend pas du nombre d'appuis
+        champ = ChampCap()
+        with Pool(processes=cpu_count()) as pool:
+            for c in pool.imap_unordered(champ_session, csv_paths):
+                champ.fusionner(c)
+        plot_champ(champ, save_dir)